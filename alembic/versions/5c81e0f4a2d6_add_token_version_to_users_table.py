@@ -0,0 +1,32 @@
+"""add_token_version_to_users_table
+
+Revision ID: 5c81e0f4a2d6
+Revises: 3a9d2c51e7b4
+Create Date: 2026-10-17 10:12:41.508213
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5c81e0f4a2d6"
+down_revision: Union[str, None] = "3a9d2c51e7b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column(
+            "token_version", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "token_version")
@@ -0,0 +1,42 @@
+"""never_reuse_user_ids
+
+Revision ID: b6e3f1a9c2d4
+Revises: 8d4b7e2f9a13
+Create Date: 2026-10-17 16:02:19.730415
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b6e3f1a9c2d4"
+down_revision: Union[str, None] = "8d4b7e2f9a13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Without AUTOINCREMENT SQLite hands the id of the newest deleted user to
+# the next one, who would then pass the revocation check with the deleted
+# user's tokens. Other databases never reuse sequence values.
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table(
+        "users",
+        recreate="always",
+        table_kwargs={"sqlite_autoincrement": True},
+    ):
+        pass
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    with op.batch_alter_table(
+        "users",
+        recreate="always",
+        table_kwargs={"sqlite_autoincrement": False},
+    ):
+        pass
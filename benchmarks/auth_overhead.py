@@ -0,0 +1,90 @@
+"""Per-request cost of bearer token authentication with and without the
+verified token cache.
+
+Measures the ``JWTBearer`` dependency on its own and a full
+``GET /surveys/current`` round trip through the app.
+
+    python benchmarks/auth_overhead.py --requests 2000
+"""
+
+import argparse
+import asyncio
+import json
+
+import httpx
+from common import create_schema, summarize, timer
+from starlette.requests import Request
+
+from app import app
+from config import session_manager
+from models.user import User
+from services.auth import JWTBearer, construct_auth_jwt, verified_token_cache
+
+
+def build_request(token: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+        }
+    )
+
+
+async def measure_dependency(token: str, requests: int, cached: bool):
+    bearer = JWTBearer()
+    request = build_request(token)
+    samples: list[float] = []
+    for _ in range(requests):
+        if not cached:
+            verified_token_cache.clear()
+        with timer(samples):
+            await bearer(request)
+    return summarize(samples)
+
+
+async def measure_endpoint(token: str, requests: int, cached: bool):
+    samples: list[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+        for _ in range(requests):
+            if not cached:
+                verified_token_cache.clear()
+            with timer(samples):
+                response = await client.get(
+                    "/surveys/current",
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+            response.raise_for_status()
+    return summarize(samples)
+
+
+async def main(requests: int):
+    await create_schema()
+    token = construct_auth_jwt(User(id=1, username="student", is_admin=False))[
+        "access_token"
+    ]
+
+    results = {}
+    for name, measure in (
+        ("dependency", measure_dependency),
+        ("endpoint", measure_endpoint),
+    ):
+        results[name] = {
+            "uncached": await measure(token, requests, cached=False),
+            "cached": await measure(token, requests, cached=True),
+        }
+    results["cache"] = verified_token_cache.stats()
+
+    await session_manager.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
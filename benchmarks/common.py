@@ -0,0 +1,153 @@
+"""Shared helpers for the benchmark scripts.
+
+Every benchmark runs against a throwaway SQLite database, so this module
+has to be imported before anything from ``src`` - the app reads its
+configuration from the environment at import time.
+"""
+
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+DB_DIR = tempfile.mkdtemp(prefix="io-lab-bench-")
+DB_PATH = os.path.join(DB_DIR, "benchmark.sqlite")
+
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{DB_PATH}")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+
+async def create_schema():
+    """Create all tables on the benchmark database from the models."""
+    import config
+    from models import Base
+
+    async with config.session_manager.connect() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+
+
+def use_database(
+    name: str,
+    engine_kwargs: dict | None = None,
+    sqlite_pragmas: dict | None = None,
+):
+    """Switch the app to a new database file ``name`` in ``DB_DIR``, by
+    default with the engine settings of the app configuration.
+
+    The session manager is replaced in every module that imported it, so
+    requests, the grade buffer and the live results all use the new one.
+    """
+    import config
+
+    url = f"sqlite+aiosqlite:///{os.path.join(DB_DIR, name)}.sqlite"
+    session_manager = config.DatabaseSessionManager(
+        url,
+        (
+            config.get_engine_kwargs(config.app_config)
+            if engine_kwargs is None
+            else engine_kwargs
+        ),
+        (
+            config.get_sqlite_pragmas(config.app_config)
+            if sqlite_pragmas is None
+            else sqlite_pragmas
+        ),
+    )
+    previous = config.session_manager
+    for module in list(sys.modules.values()):
+        if getattr(module, "session_manager", None) is previous:
+            module.session_manager = session_manager
+
+
+async def seed_voting(voters: int = 0, surveys: int = 1) -> tuple[str, list]:
+    """Create the schema with an admin, ``voters`` students and ``surveys``
+    surveys open from an hour ago to an hour from now.
+
+    The admin gets user id 1 and the students the ids from 2 on. Returns
+    the admin's access token and the students' access tokens.
+    """
+    import config
+    from models.surveys import Survey
+    from models.user import User
+    from services.auth import construct_auth_jwt
+
+    await create_schema()
+    now = datetime.now()
+    async with config.session_manager.session() as db_session:
+        admin = User(
+            username="admin",
+            first_name="Admin",
+            last_name="0",
+            password_hash="-",
+            is_admin=True,
+        )
+        students = [
+            User(
+                username=f"student{i}",
+                first_name="Student",
+                last_name=str(i),
+                password_hash="-",
+            )
+            for i in range(voters)
+        ]
+        db_session.add(admin)
+        await db_session.flush()
+        db_session.add_all(students)
+        db_session.add_all(
+            Survey(
+                title=f"Survey {i}",
+                body="Body",
+                start_at=now - timedelta(hours=1),
+                finishes_at=now + timedelta(hours=1),
+            )
+            for i in range(surveys)
+        )
+        await db_session.flush()
+        admin_token = construct_auth_jwt(admin)["access_token"]
+        tokens = [
+            construct_auth_jwt(student)["access_token"] for student in students
+        ]
+        await db_session.commit()
+    return admin_token, tokens
+
+
+def free_port() -> int:
+    """A free local TCP port to start an app server on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    """Latency summary in milliseconds for a list of timings in seconds."""
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+
+@contextmanager
+def timer(samples: list[float]):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        samples.append(time.perf_counter() - started)
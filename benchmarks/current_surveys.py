@@ -0,0 +1,100 @@
+"""Latency of the "current surveys for user" lookup as surveys grow.
+
+Compares the old per-survey grade lookup loop with the single-query
+``SurveyService.get_current_surveys_for_user``.
+
+    python benchmarks/current_surveys.py
+"""
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from common import create_schema, summarize, timer
+
+from config import session_manager
+from models.grades import Grade
+from models.surveys import Survey
+
+SURVEY_COUNTS = [100, 1_000, 10_000]
+REPEATS = 5
+USER_ID = 1
+
+
+async def seed(survey_count: int):
+    await create_schema()
+    now = datetime.now()
+    async with session_manager.session() as db_session:
+        surveys = []
+        for i in range(survey_count):
+            # Half of the surveys are open, the other half already closed
+            start_at = now - timedelta(hours=1 if i % 2 else 48)
+            surveys.append(
+                Survey(
+                    title=f"Survey {i}",
+                    body="Body",
+                    start_at=start_at,
+                    finishes_at=start_at + timedelta(hours=24),
+                )
+            )
+        db_session.add_all(surveys)
+        await db_session.flush()
+        # The user has already graded every tenth survey
+        db_session.add_all(
+            Grade(grade=5, survey_id=survey.id, user_id=USER_ID)
+            for survey in surveys[::10]
+        )
+        await db_session.commit()
+
+
+async def loop_lookup(db_session, user_id: int):
+    import services.grades as GradeService
+    import services.surveys as SurveyService
+
+    all_surveys = await SurveyService.get_all_survey(db_session) or []
+    now = datetime.now()
+    return [
+        survey
+        for survey in all_surveys
+        if (
+            (survey.start_at <= now <= survey.finishes_at)
+            and not (
+                await GradeService.get_grade_for_survey(
+                    db_session, user_id, survey.id
+                )
+            )
+        )
+    ]
+
+
+async def single_query_lookup(db_session, user_id: int):
+    import services.surveys as SurveyService
+
+    return await SurveyService.get_current_surveys_for_user(
+        db_session, user_id
+    )
+
+
+async def measure(lookup) -> dict[str, float]:
+    samples: list[float] = []
+    for _ in range(REPEATS):
+        async with session_manager.session() as db_session:
+            with timer(samples):
+                await lookup(db_session, USER_ID)
+    return summarize(samples)
+
+
+async def main():
+    results = {}
+    for survey_count in SURVEY_COUNTS:
+        await seed(survey_count)
+        results[survey_count] = {
+            "loop": await measure(loop_lookup),
+            "single_query": await measure(single_query_lookup),
+        }
+    await session_manager.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""Fires parallel duplicate ``POST /grades/`` votes and checks that exactly
+one of them is stored.
+
+The vote of a single user on a single survey is sent ``--votes`` times at
+once. Every request but one must be rejected with 409, and the grades
+table must hold a single row, both on the direct path and with the
+write-behind grade buffer.
+
+    python benchmarks/duplicate_votes.py --votes 1000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from collections import Counter
+
+import httpx
+from common import seed_voting
+from sqlalchemy import func, select
+
+from app import app
+from config import app_config, session_manager
+from models.grades import Grade
+from services.grade_buffer import grade_buffer
+
+
+async def count_grades() -> int:
+    async with session_manager.session() as db_session:
+        return (
+            await db_session.execute(select(func.count(Grade.id)))
+        ).scalar_one()
+
+
+async def run_duplicates(votes: int, buffered: bool):
+    app_config.GRADE_BUFFER_ENABLED = buffered
+    _, (token,) = await seed_voting(voters=1)
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(
+            *(
+                client.post(
+                    "/grades/",
+                    json={"grade": 5, "surveyId": 1},
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+                for _ in range(votes)
+            )
+        )
+        elapsed = time.perf_counter() - started
+    await grade_buffer.shutdown()
+
+    statuses = Counter(response.status_code for response in responses)
+    stored = await count_grades()
+    return {
+        "elapsed_s": elapsed,
+        "statuses": dict(statuses),
+        "stored_grades": stored,
+        "ok": stored == 1 and statuses == {201: 1, 409: votes - 1},
+    }
+
+
+async def main(votes: int):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = {
+        "direct": await run_duplicates(votes, buffered=False),
+        "buffered": await run_duplicates(votes, buffered=True),
+    }
+    await session_manager.close()
+    print(json.dumps(results, indent=2))
+    if not all(result["ok"] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--votes", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.votes))
@@ -0,0 +1,128 @@
+"""Throughput of ``POST /grades/bulk`` against one ``POST /grades/`` per vote.
+
+Both paths store the same votes on a fresh database: the single-vote path
+with each voter's own token, the bulk path as an admin syncing batches of
+votes on the voters' behalf, like a classroom kiosk would.
+
+    python benchmarks/grade_bulk.py --votes 5000 --batch-size 1000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import httpx
+from common import seed_voting, summarize, timer, use_database
+
+import config
+from app import app
+
+
+def client() -> httpx.AsyncClient:
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url="http://benchmark")
+
+
+async def run_single(votes, concurrency: int):
+    samples: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    stored = failed = 0
+
+    async with client() as http_client:
+
+        async def vote(token: str, survey_id: int):
+            nonlocal stored, failed
+            async with semaphore:
+                with timer(samples):
+                    response = await http_client.post(
+                        "/grades/",
+                        json={"grade": 5, "surveyId": survey_id},
+                        headers={"Authorization": f"Bearer {token}"},
+                    )
+                if response.status_code == 201:
+                    stored += 1
+                else:
+                    failed += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(vote(token, survey_id) for _, token, survey_id in votes)
+        )
+        elapsed = time.perf_counter() - started
+
+    return {
+        "votes_per_second": stored / elapsed,
+        "stored_votes": stored,
+        "failed_votes": failed,
+        "latency": summarize(samples),
+    }
+
+
+async def run_bulk(votes, admin_token: str, batch_size: int):
+    samples: list[float] = []
+    stored = 0
+
+    async with client() as http_client:
+        started = time.perf_counter()
+        for offset in range(0, len(votes), batch_size):
+            batch = [
+                {"grade": 5, "surveyId": survey_id, "userId": user_id}
+                for user_id, _, survey_id in votes[
+                    offset : offset + batch_size
+                ]
+            ]
+            with timer(samples):
+                response = await http_client.post(
+                    "/grades/bulk",
+                    json={"grades": batch},
+                    headers={"Authorization": f"Bearer {admin_token}"},
+                )
+            stored += response.json()["created"]
+        elapsed = time.perf_counter() - started
+
+    return {
+        "votes_per_second": stored / elapsed,
+        "stored_votes": stored,
+        "batch_latency": summarize(samples),
+    }
+
+
+async def main(votes: int, batch_size: int, concurrency: int):
+    surveys = 10
+    voters = max(1, votes // surveys)
+    # Failed votes are logged with a full traceback, keep the output readable
+    logging.getLogger("sqlalchemy").setLevel(logging.CRITICAL)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    results = {}
+    for name in ("single", "bulk"):
+        use_database(name)
+        admin_token, tokens = await seed_voting(voters, surveys)
+        # Students get the user ids from 2 on, after the admin
+        all_votes = [
+            (user_id, token, survey_id)
+            for survey_id in range(1, surveys + 1)
+            for user_id, token in enumerate(tokens, start=2)
+        ]
+        if name == "single":
+            results[name] = await run_single(all_votes, concurrency)
+        else:
+            results[name] = await run_bulk(all_votes, admin_token, batch_size)
+        await config.session_manager.close()
+
+    results["speedup"] = (
+        results["bulk"]["votes_per_second"]
+        / results["single"]["votes_per_second"]
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--votes", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.votes, args.batch_size, args.concurrency))
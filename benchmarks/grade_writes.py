@@ -0,0 +1,99 @@
+"""Throughput of concurrent ``POST /grades/`` writes on SQLite.
+
+Runs the same vote burst against the engine defaults the app used to have
+(NullPool, rollback journal, synchronous=FULL), against the configured
+pool with WAL and the other connection PRAGMAs, and with the write-behind
+grade buffer on top of it.
+
+    python benchmarks/grade_writes.py --votes 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import httpx
+from common import seed_voting, summarize, timer, use_database
+
+import config
+import services.grade_buffer
+from app import app
+from config import app_config, get_engine_kwargs, get_sqlite_pragmas
+
+
+async def run_votes(tokens: list[str], surveys: int, concurrency: int):
+    votes = [
+        (token, survey_id)
+        for survey_id in range(1, surveys + 1)
+        for token in tokens
+    ]
+    samples: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    failed = 0
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+
+        async def vote(token: str, survey_id: int):
+            nonlocal failed
+            async with semaphore:
+                with timer(samples):
+                    response = await client.post(
+                        "/grades/",
+                        json={"grade": 5, "surveyId": survey_id},
+                        headers={"Authorization": f"Bearer {token}"},
+                    )
+                if response.status_code != 201:
+                    failed += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(vote(*args) for args in votes))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "votes_per_second": (len(votes) - failed) / elapsed,
+        "failed_votes": failed,
+        "latency": summarize(samples),
+    }
+
+
+async def main(votes: int, concurrency: int):
+    surveys = 10
+    voters = max(1, votes // surveys)
+    tuned = (get_engine_kwargs(app_config), get_sqlite_pragmas(app_config))
+    configurations = {
+        "defaults": ({"echo": False}, {}, False),
+        "tuned": (*tuned, False),
+        "buffered": (*tuned, True),
+    }
+
+    # Failed votes are logged with a full traceback, keep the output readable
+    logging.getLogger("sqlalchemy").setLevel(logging.CRITICAL)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    results = {}
+    for name, (
+        engine_kwargs,
+        sqlite_pragmas,
+        buffered,
+    ) in configurations.items():
+        use_database(name, engine_kwargs, sqlite_pragmas)
+        app_config.GRADE_BUFFER_ENABLED = buffered
+        _, tokens = await seed_voting(voters, surveys)
+        results[name] = await run_votes(tokens, surveys, concurrency)
+        await services.grade_buffer.grade_buffer.shutdown()
+        await config.session_manager.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--votes", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.votes, args.concurrency))
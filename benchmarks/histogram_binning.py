@@ -0,0 +1,123 @@
+"""Report histogram binning: the old nested loop against NumPy.
+
+Both implementations are checked to produce the same counts before they
+are timed.
+
+    python benchmarks/histogram_binning.py --bins 20
+"""
+
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Sequence
+
+import numpy as np
+from common import summarize, timer
+
+from services.aggregation import get_time_bins
+
+VOTE_COUNTS = [1_000, 10_000, 100_000, 300_000]
+REPEATS = 3
+MICROSECOND = timedelta(microseconds=1)
+
+
+def loop_time_bins(timestamps, time_bins):
+    grade_counts = []
+    for i in range(len(time_bins) - 1):
+        start = time_bins[i]
+        end = time_bins[i + 1]
+        count = sum(start <= grade_time < end for grade_time in timestamps)
+        grade_counts.append(count)
+    return grade_counts
+
+
+def loop_grades(grades):
+    return {grade: grades.count(grade) for grade in set(grades)}
+
+
+def count_in_time_bins(
+    timestamps: Sequence[datetime], time_bins: Sequence[datetime]
+) -> list[int]:
+    """Number of timestamps in each ``[time_bins[i], time_bins[i + 1])``.
+
+    Timestamps outside of the bins are not counted.
+    """
+    bin_count = len(time_bins) - 1
+    if bin_count < 1 or not timestamps:
+        return [0] * max(bin_count, 0)
+
+    # Exact integer microsecond offsets from the first edge. Converting
+    # datetime objects with np.array(..., dtype="datetime64") is much slower
+    started_at = time_bins[0]
+    edges = np.fromiter(
+        ((edge - started_at) // MICROSECOND for edge in time_bins),
+        dtype=np.int64,
+        count=len(time_bins),
+    )
+    values = np.fromiter(
+        ((timestamp - started_at) // MICROSECOND for timestamp in timestamps),
+        dtype=np.int64,
+        count=len(timestamps),
+    )
+
+    # Index of the last edge that is <= the timestamp, i.e. its bin
+    bin_indexes = np.searchsorted(edges, values, side="right") - 1
+    in_range = (bin_indexes >= 0) & (bin_indexes < bin_count)
+    return np.bincount(bin_indexes[in_range], minlength=bin_count).tolist()
+
+
+def count_grades(grades: Sequence[int]) -> dict[int, int]:
+    """Number of votes for every given grade, ordered by grade."""
+    if not grades:
+        return {}
+    values, counts = np.unique(np.asarray(grades), return_counts=True)
+    return dict(zip(values.tolist(), counts.tolist()))
+
+
+def measure(func, *args) -> dict[str, float]:
+    samples: list[float] = []
+    for _ in range(REPEATS):
+        with timer(samples):
+            func(*args)
+    return summarize(samples)
+
+
+def main(bins: int):
+    started_at = datetime(2024, 11, 4, 8, 0)
+    closes_at = started_at + timedelta(hours=2)
+    time_bins = get_time_bins(started_at, closes_at, bins)
+    random.seed(0)
+
+    results = {}
+    for vote_count in VOTE_COUNTS:
+        timestamps = [
+            started_at + timedelta(seconds=random.uniform(-600, 7800))
+            for _ in range(vote_count)
+        ]
+        grades = [random.randint(1, 5) for _ in range(vote_count)]
+
+        assert loop_time_bins(timestamps, time_bins) == count_in_time_bins(
+            timestamps, time_bins
+        )
+        assert loop_grades(grades) == count_grades(grades)
+
+        results[vote_count] = {
+            "time_bins": {
+                "loop": measure(loop_time_bins, timestamps, time_bins),
+                "numpy": measure(count_in_time_bins, timestamps, time_bins),
+            },
+            "grade_counts": {
+                "loop": measure(loop_grades, grades),
+                "numpy": measure(count_grades, grades),
+            },
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bins", type=int, default=20)
+    args = parser.parse_args()
+    main(args.bins)
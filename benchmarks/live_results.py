@@ -0,0 +1,212 @@
+"""Fan-out of ``GET /surveys/{id}/live`` to many subscribers.
+
+Starts the app in a single uvicorn worker, connects ``--subscribers``
+clients to the live results of one survey and sends ``--votes`` votes
+through ``POST /grades/`` while they listen. Reports how many events the
+subscribers got (coalescing), how long after the last vote each of them
+saw the final count, and how many SQL statements the worker ran, which
+must not grow with the number of subscribers.
+
+    python benchmarks/live_results.py --subscribers 1000 --votes 500
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import time
+
+import httpx
+from common import SRC_DIR, free_port, seed_voting, summarize, timer
+
+from config import session_manager
+
+# Scrapes the /metrics of the worker started below
+METRICS_TOKEN = secrets.token_urlsafe()
+
+
+async def start_worker(port: int, interval_ms: int) -> subprocess.Popen:
+    worker = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+            "--timeout-graceful-shutdown",
+            "1",
+        ],
+        cwd=SRC_DIR,
+        env={
+            **os.environ,
+            "LIVE_RESULTS_INTERVAL_MS": str(interval_ms),
+            "SLOW_REQUEST_THRESHOLD_MS": "0",
+            "METRICS_ENABLED": "true",
+            "METRICS_TOKEN": METRICS_TOKEN,
+        },
+    )
+    async with httpx.AsyncClient() as client:
+        for _ in range(100):
+            try:
+                await client.get(f"http://127.0.0.1:{port}/")
+                return worker
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    worker.kill()
+    raise RuntimeError("The worker did not start")
+
+
+async def read_metric(client: httpx.AsyncClient, name: str) -> float:
+    response = await client.get(
+        "/metrics", headers={"Authorization": f"Bearer {METRICS_TOKEN}"}
+    )
+    for line in response.text.splitlines():
+        if line.startswith(f"{name} "):
+            return float(line.split()[1])
+    return 0
+
+
+class Subscriber:
+    def __init__(self):
+        self.connected = asyncio.Event()
+        self.events = 0
+        self.count = 0
+        self.count_changed = asyncio.Event()
+        self.final_count_seen_at: float | None = None
+
+    async def listen(
+        self, client: httpx.AsyncClient, token: str, final_count: int
+    ):
+        async with client.stream(
+            "GET",
+            "/surveys/1/live",
+            headers={"Authorization": f"Bearer {token}"},
+        ) as response:
+            self.connected.set()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                self.events += 1
+                self.count = json.loads(line[len("data: ") :])["count"]
+                if self.count >= final_count:
+                    self.final_count_seen_at = time.perf_counter()
+                    return
+
+
+async def run_live_results(args: argparse.Namespace) -> dict:
+    admin_token, tokens = await seed_voting(args.votes)
+    await session_manager.close()
+    port = free_port()
+    worker = await start_worker(port, args.interval_ms)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=None
+        ) as client:
+            subscribers = [Subscriber() for _ in range(args.subscribers)]
+            started = time.perf_counter()
+            listeners = [
+                asyncio.create_task(
+                    subscriber.listen(client, admin_token, args.votes)
+                )
+                for subscriber in subscribers
+            ]
+            await asyncio.gather(
+                *(subscriber.connected.wait() for subscriber in subscribers)
+            )
+            connect_seconds = time.perf_counter() - started
+
+            # Subscribers only listen, the worker must not query per client
+            statements_before_idle = await read_metric(
+                client, "db_statements_total"
+            )
+            await asyncio.sleep(args.idle_seconds)
+            idle_statements = int(
+                await read_metric(client, "db_statements_total")
+                - statements_before_idle
+            )
+
+            semaphore = asyncio.Semaphore(args.concurrency)
+            vote_samples: list[float] = []
+
+            # Votes get a pool of their own, the one of the subscribers is
+            # busy with their streams
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{port}", timeout=None
+            ) as vote_client:
+
+                async def vote(token: str, grade: int):
+                    async with semaphore:
+                        with timer(vote_samples):
+                            await vote_client.post(
+                                "/grades/",
+                                json={"grade": grade, "surveyId": 1},
+                                headers={"Authorization": f"Bearer {token}"},
+                            )
+
+                voting_started = time.perf_counter()
+                await asyncio.gather(
+                    *(vote(token, i % 5 + 1) for i, token in enumerate(tokens))
+                )
+                last_vote_at = time.perf_counter()
+            await asyncio.wait(listeners, timeout=args.timeout)
+            for listener in listeners:
+                listener.cancel()
+            await asyncio.gather(*listeners, return_exceptions=True)
+            # Every publisher must be gone with its last subscriber
+            await asyncio.sleep(0.5)
+            subscribers_left = await read_metric(
+                client, "live_results_subscribers"
+            )
+
+        events = [subscriber.events for subscriber in subscribers]
+        lags = [
+            max(subscriber.final_count_seen_at - last_vote_at, 0)
+            for subscriber in subscribers
+            if subscriber.final_count_seen_at is not None
+        ]
+        return {
+            "subscribers": args.subscribers,
+            "connect_seconds": connect_seconds,
+            "idle_seconds": args.idle_seconds,
+            "idle_db_statements": idle_statements,
+            "votes": args.votes,
+            "voting_seconds": last_vote_at - voting_started,
+            "vote_latency": summarize(vote_samples),
+            "subscribers_with_final_count": len(lags),
+            "events_per_subscriber": {
+                "min": min(events),
+                "mean": sum(events) / len(events),
+                "max": max(events),
+            },
+            "final_count_lag": summarize(lags) if lags else None,
+            "subscribers_left": int(subscribers_left),
+        }
+    finally:
+        worker.terminate()
+        worker.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--votes", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--interval-ms", type=int, default=1000)
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    print(json.dumps(asyncio.run(run_live_results(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
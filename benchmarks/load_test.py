@@ -0,0 +1,292 @@
+"""Load test of the whole app on a seeded throwaway database.
+
+Users, surveys and grades are created through the services, then the real
+``app`` is driven in-process over the ASGI transport with concurrent
+scenarios:
+
+- login_storm: every user logs in at once
+- vote_burst: every user votes on a survey nobody graded yet
+- current_polling: users poll ``GET /surveys/current``
+- report_download: an admin downloads the PDF report of several surveys
+
+Throughput and p50/p95/p99 latencies are printed as JSON, together with
+the git commit, and can be written to a file and compared with the file
+of another commit:
+
+    python benchmarks/load_test.py --output before.json
+    python benchmarks/load_test.py --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+import httpx
+from common import create_schema, summarize, timer
+from sqlalchemy import select
+
+import services.grades as GradeService
+import services.surveys as SurveyService
+import services.user as UserService
+from app import app
+from config import session_manager
+from models.user import User
+from schemas.grades import GradeBulkItemSchema
+from schemas.surveys import SurveySchema
+from schemas.user import UserSignUpSchema
+from services.reports import report_jobs
+
+PASSWORD = "load-test-password"
+ADMIN_USERNAME = "load-test-admin"
+
+
+async def seed(users: int, surveys: int, grades_per_user: int) -> dict:
+    """Seeds users, surveys and grades, the last survey is left ungraded
+    for the vote burst"""
+    await create_schema()
+    now = datetime.now()
+    started = time.perf_counter()
+
+    async with session_manager.session() as db_session:
+        await asyncio.gather(
+            UserService.create_user(
+                db_session,
+                UserSignUpSchema(
+                    username=ADMIN_USERNAME,
+                    password=PASSWORD,
+                    first_name="Load",
+                    last_name="Admin",
+                    is_admin=True,
+                ),
+                commit_and_refresh=False,
+            ),
+            *(
+                UserService.create_user(
+                    db_session,
+                    UserSignUpSchema(
+                        username=f"student{i}",
+                        password=PASSWORD,
+                        first_name="Student",
+                        last_name=str(i),
+                        is_admin=False,
+                    ),
+                    commit_and_refresh=False,
+                )
+                for i in range(users)
+            ),
+        )
+        await db_session.commit()
+        # Passwords are hashed concurrently, which leaves the ids in no
+        # particular order
+        user_ids = dict(
+            (await db_session.execute(select(User.username, User.id))).all()
+        )
+
+        for i in range(surveys + 1):
+            await SurveyService.create_survey(
+                db_session,
+                SurveySchema(
+                    title=f"Survey {i}",
+                    body="Load test survey",
+                    start_at=now - timedelta(hours=1),
+                    finishes_at=now + timedelta(days=1),
+                ),
+                commit_and_refresh=False,
+            )
+        await db_session.commit()
+
+    random_grades = random.Random(0)
+    grades = [
+        GradeBulkItemSchema(
+            grade=random_grades.randint(1, 5),
+            survey_id=survey_id,
+            user_id=user_id,
+        )
+        for user_id in (user_ids[f"student{i}"] for i in range(users))
+        for survey_id in random_grades.sample(
+            range(1, surveys + 1), min(grades_per_user, surveys)
+        )
+    ]
+    async with session_manager.session() as db_session:
+        for offset in range(0, len(grades), 5000):
+            await GradeService.add_grades(
+                db_session,
+                grades[offset : offset + 5000],
+                user_id=user_ids[ADMIN_USERNAME],
+            )
+
+    return {
+        "users": users,
+        "surveys": surveys + 1,
+        "grades": len(grades),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+async def run_scenario(
+    requests: list[Callable[[], Awaitable[httpx.Response]]],
+    concurrency: int,
+    responses: list[httpx.Response] | None = None,
+) -> dict:
+    samples: list[float] = []
+    statuses: Counter[int] = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(request: Callable[[], Awaitable[httpx.Response]]):
+        async with semaphore:
+            with timer(samples):
+                response = await request()
+            statuses[response.status_code] += 1
+            if responses is not None:
+                responses.append(response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(request) for request in requests))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests_per_second": len(requests) / elapsed,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "latency": summarize(samples),
+    }
+
+
+async def run_load_test(args: argparse.Namespace) -> dict:
+    seeded = await seed(args.users, args.surveys, args.grades_per_user)
+    burst_survey_id = args.surveys + 1
+    results = {}
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://load-test", timeout=None
+    ) as client:
+
+        def login(username: str):
+            return lambda: client.post(
+                "/users/login",
+                json={"username": username, "password": PASSWORD},
+            )
+
+        logins: list[httpx.Response] = []
+        results["login_storm"] = await run_scenario(
+            [login(f"student{i}") for i in range(args.users)],
+            args.concurrency,
+            logins,
+        )
+
+        # The other scenarios use the tokens of the storm
+        tokens = [
+            response.json()["accessToken"]
+            for response in logins
+            if response.status_code == 200
+        ]
+        admin_token = (await login(ADMIN_USERNAME)()).json()["accessToken"]
+
+        def get(path: str, token: str):
+            return lambda: client.get(
+                path, headers={"Authorization": f"Bearer {token}"}
+            )
+
+        def vote(token: str):
+            return lambda: client.post(
+                "/grades/",
+                json={"grade": 5, "surveyId": burst_survey_id},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+
+        results["vote_burst"] = await run_scenario(
+            [vote(token) for token in tokens], args.concurrency
+        )
+        results["current_polling"] = await run_scenario(
+            [
+                get("/surveys/current", token)
+                for _ in range(args.polls)
+                for token in tokens
+            ],
+            args.concurrency,
+        )
+        results["report_download"] = await run_scenario(
+            [
+                get(f"/surveys/{survey_id}/report", admin_token)
+                for _ in range(args.report_downloads)
+                for survey_id in range(1, min(args.surveys, 5) + 1)
+            ],
+            args.concurrency,
+        )
+
+    report_jobs.shutdown()
+    await session_manager.close()
+    return {"seed": seeded, "scenarios": results}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict) -> dict:
+    """Ratio of every scenario's numbers to the baseline, above 1 for
+    latencies means slower"""
+    comparison = {}
+    for name, scenario in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        comparison[name] = {
+            "requests_per_second": scenario["requests_per_second"]
+            / before["requests_per_second"],
+            **{
+                key: scenario["latency"][key] / before["latency"][key]
+                for key in ("p50_ms", "p95_ms", "p99_ms")
+                if before["latency"][key]
+            },
+        }
+    return comparison
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--surveys", type=int, default=20)
+    parser.add_argument("--grades-per-user", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--polls", type=int, default=5)
+    parser.add_argument("--report-downloads", type=int, default=2)
+    parser.add_argument("--output", help="Also write the results here")
+    parser.add_argument("--baseline", help="Results of an earlier run")
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = {
+        "commit": git_commit(),
+        "arguments": vars(args),
+        **asyncio.run(run_load_test(args)),
+    }
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        results["baseline_commit"] = baseline.get("commit")
+        results["compared_to_baseline"] = compare(results, baseline)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Latency of unrelated requests while a burst of logins is verified.
+
+Fires ``--logins`` concurrent ``POST /users/login`` requests at the app
+in-process and polls ``GET /`` meanwhile. Run once with bcrypt calls made
+directly on the event loop (the old behaviour) and once through the
+password hashing worker pool.
+
+    python benchmarks/login_storm.py --logins 200 --rounds 12
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from common import create_schema, summarize
+from passlib.hash import bcrypt
+
+from app import app
+from config import session_manager
+from models.user import User
+from services.passwords import password_hasher, verify_password
+
+USERNAME = "student"
+PASSWORD = "password"
+POLL_INTERVAL = 0.01
+
+
+async def seed(rounds: int):
+    await create_schema()
+    async with session_manager.session() as db_session:
+        db_session.add(
+            User(
+                username=USERNAME,
+                first_name="Student",
+                last_name="Benchmark",
+                password_hash=bcrypt.using(rounds=rounds).hash(PASSWORD),
+            )
+        )
+        await db_session.commit()
+
+
+async def run_storm(logins: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+        poll_samples: list[float] = []
+        storm_done = asyncio.Event()
+
+        async def poll():
+            # Latency is measured from when the request was due, so time
+            # spent waiting for a blocked event loop is not hidden
+            due_at = time.perf_counter()
+            while not storm_done.is_set():
+                await asyncio.sleep(max(0, due_at - time.perf_counter()))
+                await client.get("/")
+                poll_samples.append(time.perf_counter() - due_at)
+                due_at += POLL_INTERVAL
+
+        async def login():
+            response = await client.post(
+                "/users/login",
+                json={"username": USERNAME, "password": PASSWORD},
+            )
+            response.raise_for_status()
+
+        poller = asyncio.create_task(poll())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        storm_done.set()
+        await poller
+
+    return {
+        "logins_per_second": logins / elapsed,
+        "unrelated_requests": summarize(poll_samples),
+    }
+
+
+async def main(logins: int, rounds: int):
+    await seed(rounds)
+
+    original_verify = password_hasher.verify
+
+    async def verify_on_event_loop(password: str, password_hash: str):
+        return verify_password(password, password_hash)
+
+    password_hasher.verify = verify_on_event_loop  # type: ignore
+    on_event_loop = await run_storm(logins)
+    password_hasher.verify = original_verify  # type: ignore
+
+    worker_pool = await run_storm(logins)
+    worker_pool["hasher"] = password_hasher.stats()
+
+    password_hasher.shutdown()
+    await session_manager.close()
+    print(
+        json.dumps(
+            {"event_loop": on_event_loop, "worker_pool": worker_pool},
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.rounds))
@@ -0,0 +1,89 @@
+"""Check that SQLite serves the hot grade/survey lookups from indexes.
+
+Prints ``EXPLAIN QUERY PLAN`` for each query and exits non-zero if any of
+them falls back to a full table scan or picks an unexpected index.
+
+    python benchmarks/query_plans.py
+"""
+
+import asyncio
+import sys
+from datetime import datetime
+
+from common import create_schema
+from sqlalchemy import select, text
+
+from config import session_manager
+from models.grades import Grade
+from models.surveys import Survey
+
+EXPECTED_INDEXES = {
+    "get_grade_for_survey": "ix_grades_survey_id_user_id",
+    "get_grades_by_survey": "ix_grades_survey_id_created_at",
+    "get_current_surveys_for_user": "ix_surveys_start_at_finishes_at",
+}
+
+
+def build_queries():
+    now = datetime.now()
+    already_graded = select(Grade.id).where(
+        (Grade.survey_id == Survey.id) & (Grade.user_id == 1)
+    )
+    return {
+        "get_grade_for_survey": select(Grade).where(
+            (Grade.user_id == 1) & (Grade.survey_id == 1)
+        ),
+        "get_grades_by_survey": select(Grade)
+        .where(Grade.survey_id == 1)
+        .order_by(Grade.created_at),
+        "get_current_surveys_for_user": select(Survey).where(
+            (Survey.start_at <= now)
+            & (Survey.finishes_at >= now)
+            & ~already_graded.exists()
+        ),
+    }
+
+
+async def explain_queries() -> dict[str, list[str]]:
+    """``EXPLAIN QUERY PLAN`` details of every query on a fresh schema"""
+    await create_schema()
+    plans = {}
+    async with session_manager.connect() as connection:
+        for name, query in build_queries().items():
+            compiled = query.compile(
+                dialect=connection.dialect,
+                compile_kwargs={"literal_binds": True},
+            )
+            plan = (
+                await connection.execute(
+                    text(f"EXPLAIN QUERY PLAN {compiled}")
+                )
+            ).all()
+            plans[name] = [row[-1] for row in plan]
+    return plans
+
+
+def uses_index(details: list[str], index: str) -> bool:
+    """Whether a plan searches ``index`` without any full table scan"""
+    scans = [detail for detail in details if detail.startswith("SCAN ")]
+    return not scans and any(index in detail for detail in details)
+
+
+async def main() -> int:
+    plans = await explain_queries()
+    await session_manager.close()
+    failures = 0
+    for name, details in plans.items():
+        print(name)
+        for detail in details:
+            print(f"    {detail}")
+
+        expected = EXPECTED_INDEXES[name]
+        if not uses_index(details, expected):
+            print(f"    FAIL: expected a search using {expected}")
+            failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,114 @@
+"""Peak memory of rendering a survey report with a very large vote count.
+
+Seeds one survey with ``--votes`` grades, renders its report in a fresh
+worker process (like the report job manager does) and fails if the
+worker's peak RSS exceeds ``--rss-budget-mb``.
+
+    python benchmarks/report_memory.py --votes 1000000 --rss-budget-mb 512
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from common import create_schema
+from sqlalchemy import insert
+
+from config import session_manager
+from models.grades import Grade
+from models.surveys import Survey
+
+BATCH_SIZE = 50_000
+
+
+async def seed(votes: int) -> tuple[int, int]:
+    await create_schema()
+    started_at = datetime(2024, 11, 4, 8, 0)
+    duration = timedelta(hours=2)
+    async with session_manager.session() as db_session:
+        survey = Survey(
+            title="Benchmark",
+            body="Body",
+            start_at=started_at,
+            finishes_at=started_at + duration,
+        )
+        db_session.add(survey)
+        await db_session.flush()
+        survey_id = survey.id
+
+        step = duration / votes
+        for batch_start in range(0, votes, BATCH_SIZE):
+            await db_session.execute(
+                insert(Grade),
+                [
+                    {
+                        "grade": i % 5 + 1,
+                        "survey_id": survey_id,
+                        "user_id": i,
+                        "created_at": started_at + i * step,
+                    }
+                    for i in range(
+                        batch_start, min(batch_start + BATCH_SIZE, votes)
+                    )
+                ],
+            )
+        await db_session.commit()
+    return survey_id, votes
+
+
+async def seed_and_close(votes: int) -> tuple[int, int]:
+    survey_id, last_grade_id = await seed(votes)
+    await session_manager.close()
+    return survey_id, last_grade_id
+
+
+def render_in_worker(survey_id: int, last_grade_id: int) -> dict:
+    from services.reports import build_report_pdf
+
+    started = time.perf_counter()
+    pdf = build_report_pdf(survey_id, last_grade_id)
+    return {
+        "seconds": time.perf_counter() - started,
+        "pdf_mb": len(pdf) / 2**20,
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / 1024,
+    }
+
+
+def render_report(survey_id: int, last_grade_id: int) -> dict:
+    """Render the report in a fresh worker process and measure it"""
+    # Pages of a memory mapped SQLite file count towards RSS although they
+    # are page cache, not memory the report needs, so mmap is disabled
+    os.environ["SQLITE_MMAP_SIZE"] = "0"
+
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(
+            render_in_worker, survey_id, last_grade_id
+        ).result()
+
+
+def main(votes: int, rss_budget_mb: float) -> int:
+    survey_id, last_grade_id = asyncio.run(seed_and_close(votes))
+    result = render_report(survey_id, last_grade_id)
+    result["votes"] = votes
+    result["rss_budget_mb"] = rss_budget_mb
+    print(json.dumps(result, indent=2))
+    return 0 if result["peak_rss_mb"] <= rss_budget_mb else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--votes", type=int, default=1_000_000)
+    parser.add_argument("--rss-budget-mb", type=float, default=512)
+    args = parser.parse_args()
+    sys.exit(main(args.votes, args.rss_budget_mb))
@@ -0,0 +1,150 @@
+"""Serialization cost of large list responses.
+
+The same 10k ORM rows are returned by three variants of a route and
+fetched over the ASGI transport:
+
+- json: ``response_model`` with FastAPI's default JSONResponse
+- orjson: ``response_model`` with ORJSONResponse, the app's default
+- type_adapter: ``json_response`` with a pre-built TypeAdapter
+
+for a plain list of surveys and for a cursor page of users. The bodies of
+all variants must decode to the same JSON.
+
+    python benchmarks/serialization.py --rows 10000 --iterations 20
+"""
+
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Sequence
+
+import httpx
+from common import summarize, timer
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+from models.surveys import Survey
+from models.user import User
+from routes import json_response
+from schemas import CursorPaginatedSchema
+from schemas.surveys import SurveyPlusSchema
+from schemas.user import UserPlusSchema
+
+
+def build_rows(rows: int) -> tuple[list[Survey], dict]:
+    now = datetime.now()
+    surveys = [
+        Survey(
+            id=i,
+            title=f"Survey {i}",
+            body="How satisfied are you with the course? " * 4,
+            start_at=now - timedelta(days=1, seconds=i),
+            finishes_at=now + timedelta(days=1, seconds=i),
+        )
+        for i in range(1, rows + 1)
+    ]
+    users_page = {
+        "docs": [
+            User(
+                id=i,
+                username=f"student{i}",
+                first_name="Student",
+                last_name=str(i),
+                is_admin=False,
+            )
+            for i in range(1, rows + 1)
+        ],
+        "next_cursor": rows,
+        "has_next_page": True,
+        "total_docs": None,
+    }
+    return surveys, users_page
+
+
+def build_apps(surveys: list[Survey], users_page: dict) -> dict[str, FastAPI]:
+    survey_list_serializer = TypeAdapter(Sequence[SurveyPlusSchema])
+    user_page_serializer = TypeAdapter(CursorPaginatedSchema[UserPlusSchema])
+    apps = {}
+    for name, response_class in (
+        ("json", JSONResponse),
+        ("orjson", ORJSONResponse),
+        ("type_adapter", ORJSONResponse),
+    ):
+        app = FastAPI(default_response_class=response_class)
+        if name == "type_adapter":
+
+            @app.get("/surveys", response_model=Sequence[SurveyPlusSchema])
+            async def get_surveys():
+                return json_response(survey_list_serializer, surveys)
+
+            @app.get(
+                "/users",
+                response_model=CursorPaginatedSchema[UserPlusSchema],
+            )
+            async def get_users():
+                return json_response(user_page_serializer, users_page)
+
+        else:
+
+            @app.get("/surveys", response_model=Sequence[SurveyPlusSchema])
+            async def get_surveys():
+                return surveys
+
+            @app.get(
+                "/users",
+                response_model=CursorPaginatedSchema[UserPlusSchema],
+            )
+            async def get_users():
+                return users_page
+
+        apps[name] = app
+    return apps
+
+
+async def measure(app: FastAPI, path: str, iterations: int):
+    samples: list[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark"
+    ) as client:
+        # Warm up the route and the schema validators
+        body = (await client.get(path)).content
+        for _ in range(iterations):
+            with timer(samples):
+                response = await client.get(path)
+            assert response.status_code == 200
+    return samples, body
+
+
+async def main(rows: int, iterations: int):
+    surveys, users_page = build_rows(rows)
+    apps = build_apps(surveys, users_page)
+    results = {}
+    for path in ("/surveys", "/users"):
+        bodies = {}
+        results[path] = {}
+        for name, app in apps.items():
+            samples, bodies[name] = await measure(app, path, iterations)
+            results[path][name] = {
+                **summarize(samples),
+                "body_bytes": len(bodies[name]),
+            }
+        decoded = [json.loads(body) for body in bodies.values()]
+        results[path]["same_json"] = all(
+            body == decoded[0] for body in decoded
+        )
+        baseline = results[path]["json"]["mean_ms"]
+        results[path]["speedup"] = {
+            name: baseline / results[path][name]["mean_ms"] for name in apps
+        }
+    print(json.dumps({"rows": rows, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.iterations))
@@ -0,0 +1,168 @@
+"""Throughput of the development and the production entry points.
+
+Seeds a database, starts ``python src/main.py`` with ENVIRONMENT=develop
+(one worker with the auto-reloader) and with ENVIRONMENT=production
+(SERVER_WORKERS workers, uvloop, httptools) and loads each of them for
+``--duration`` seconds from ``--clients`` processes, each keeping
+``--connections`` keep-alive connections busy with a mix of ``GET /``,
+``GET /surveys/1`` and ``GET /users/current``.
+
+    python benchmarks/server_throughput.py --duration 10 --workers 4
+
+A minimal HTTP/1.1 client is used instead of httpx, whose per-request
+overhead would be measured instead of the server's.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+from common import SRC_DIR, free_port, seed_voting, summarize
+
+from config import session_manager
+
+PATHS = ("/", "/surveys/1", "/users/current")
+
+
+async def seed() -> str:
+    admin_token, _ = await seed_voting()
+    await session_manager.close()
+    return admin_token
+
+
+async def keep_alive_connection(
+    port: int, token: str, deadline: float, offset: int
+) -> tuple[list[float], int]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    requests = [
+        (
+            f"GET {path} HTTP/1.1\r\nHost: benchmark\r\n"
+            f"Authorization: Bearer {token}\r\n\r\n"
+        ).encode()
+        for path in PATHS
+    ]
+    samples: list[float] = []
+    errors = 0
+    i = offset
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        writer.write(requests[i % len(requests)])
+        i += 1
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in head.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        await reader.readexactly(length)
+        samples.append(time.perf_counter() - started)
+        if not head.startswith(b"HTTP/1.1 200"):
+            errors += 1
+    writer.close()
+    return samples, errors
+
+
+def run_client(port: int, token: str, connections: int, duration: float):
+    async def run():
+        deadline = time.perf_counter() + duration
+        return await asyncio.gather(
+            *(
+                keep_alive_connection(port, token, deadline, i)
+                for i in range(connections)
+            )
+        )
+
+    results = asyncio.run(run())
+    return (
+        [sample for samples, _ in results for sample in samples],
+        sum(errors for _, errors in results),
+    )
+
+
+def start_server(port: int, env: dict) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=SRC_DIR,
+        env={
+            **os.environ,
+            **env,
+            "SERVER_PORT": str(port),
+            "SLOW_REQUEST_THRESHOLD_MS": "0",
+        },
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5)
+            break
+        except OSError:
+            time.sleep(0.1)
+    # The other workers may still be starting, the warm-up waits for them
+    return server
+
+
+def measure(env: dict, token: str, args: argparse.Namespace) -> dict:
+    port = free_port()
+    server = start_server(port, env)
+    try:
+        # Warm up the workers, then measure
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            pool.starmap(
+                run_client,
+                [(port, token, args.connections, 1)] * args.clients,
+            )
+            started = time.perf_counter()
+            results = pool.starmap(
+                run_client,
+                [(port, token, args.connections, args.duration)]
+                * args.clients,
+            )
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    samples = [sample for client, _ in results for sample in client]
+    return {
+        "requests_per_second": len(samples) / elapsed,
+        "errors": sum(errors for _, errors in results),
+        "latency": summarize(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    token = asyncio.run(seed())
+    results = {
+        "cpus": os.cpu_count(),
+        "develop": measure({"ENVIRONMENT": "develop"}, token, args),
+        "production": measure(
+            {
+                "ENVIRONMENT": "production",
+                "SERVER_WORKERS": str(args.workers),
+            },
+            token,
+            args,
+        ),
+    }
+    results["speedup"] = (
+        results["production"]["requests_per_second"]
+        / results["develop"]["requests_per_second"]
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Checks that the survey tallies match the grades table after concurrent
+voting, and compares reading results from the tallies with computing
+statistics from the votes.
+
+Students vote at once through ``POST /grades/`` and ``POST /grades/bulk``
+on a first set of surveys, then through the write-behind grade buffer on
+a second set. ``check_tallies`` must then find no difference, also after
+``rebuild_tallies``.
+
+    python benchmarks/tally_consistency.py --voters 300 --surveys 4
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+from collections import Counter
+
+import httpx
+from common import seed_voting, summarize, timer
+
+import services.tallies as TallyService
+from app import app
+from config import app_config, session_manager
+from services.grade_buffer import grade_buffer
+
+
+async def check() -> list[int]:
+    async with session_manager.session() as db_session:
+        return await TallyService.check_tallies(db_session)
+
+
+async def run_consistency(args: argparse.Namespace) -> dict:
+    admin_token, tokens = await seed_voting(args.voters, args.surveys)
+    # Half of the surveys get direct and bulk votes, the rest buffered ones
+    direct_surveys = range(1, args.surveys // 2 + 1)
+    buffered_surveys = range(args.surveys // 2 + 1, args.surveys + 1)
+    random_grades = random.Random(0)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    statuses: Counter[str] = Counter()
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://benchmark", timeout=None
+    ) as client:
+
+        async def post(path: str, token: str, body: dict, kind: str):
+            async with semaphore:
+                response = await client.post(
+                    path,
+                    json=body,
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+            statuses[f"{kind}_{response.status_code}"] += 1
+
+        # Even students vote one by one, odd ones are sent in bulk by the
+        # admin, both at the same time on the same surveys
+        votes = [
+            (student, survey_id, random_grades.randint(1, 5))
+            for student in range(len(tokens))
+            for survey_id in direct_surveys
+        ]
+        bulk_votes = [
+            {"grade": grade, "surveyId": survey_id, "userId": student + 2}
+            for student, survey_id, grade in votes
+            if student % 2
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                post(
+                    "/grades/",
+                    tokens[student],
+                    {"grade": grade, "surveyId": survey_id},
+                    "direct",
+                )
+                for student, survey_id, grade in votes
+                if not student % 2
+            ),
+            *(
+                post(
+                    "/grades/bulk",
+                    admin_token,
+                    {"grades": bulk_votes[offset : offset + 50]},
+                    "bulk",
+                )
+                for offset in range(0, len(bulk_votes), 50)
+            ),
+        )
+        app_config.GRADE_BUFFER_ENABLED = True
+        await asyncio.gather(
+            *(
+                post(
+                    "/grades/",
+                    token,
+                    {
+                        "grade": random_grades.randint(1, 5),
+                        "surveyId": survey_id,
+                    },
+                    "buffered",
+                )
+                for token in tokens
+                for survey_id in buffered_surveys
+            )
+        )
+        await grade_buffer.shutdown()
+        app_config.GRADE_BUFFER_ENABLED = False
+        voting_seconds = time.perf_counter() - started
+
+        mismatched = await check()
+        async with session_manager.session() as db_session:
+            rebuilt_votes = await TallyService.rebuild_tallies(db_session)
+        mismatched_after_rebuild = await check()
+
+        reads: dict[str, dict] = {}
+        for name in ("results", "stats"):
+            samples: list[float] = []
+            for _ in range(args.reads):
+                with timer(samples):
+                    await client.get(
+                        f"/surveys/1/{name}",
+                        headers={"Authorization": f"Bearer {admin_token}"},
+                    )
+            reads[name] = summarize(samples)
+
+    return {
+        "voting_seconds": voting_seconds,
+        "statuses": dict(statuses),
+        "rebuilt_votes": rebuilt_votes,
+        "mismatched_surveys": mismatched,
+        "mismatched_surveys_after_rebuild": mismatched_after_rebuild,
+        "reads": reads,
+        "ok": not mismatched and not mismatched_after_rebuild,
+    }
+
+
+async def main(args: argparse.Namespace):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("sqlalchemy").setLevel(logging.CRITICAL)
+    results = await run_consistency(args)
+    await session_manager.close()
+    print(json.dumps(results, indent=2))
+    if not results["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--voters", type=int, default=300)
+    parser.add_argument("--surveys", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args))
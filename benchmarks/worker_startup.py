@@ -0,0 +1,176 @@
+"""Startup time and memory of a single uvicorn worker.
+
+Starts ``uvicorn app:app`` ``--runs`` times and measures the time until
+the first request is answered, the RSS of the worker and the time of the
+first PDF report. It does this for the current tree, for the current tree
+with REPORT_PRELOAD and, with ``--baseline-ref``, for another commit
+checked out in a temporary git worktree:
+
+    python benchmarks/worker_startup.py --baseline-ref HEAD~1 --runs 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from common import SRC_DIR, free_port, seed_voting
+
+from config import session_manager
+
+REPO_DIR = os.path.dirname(SRC_DIR)
+
+
+async def seed() -> str:
+    admin_token, _ = await seed_voting()
+    await session_manager.close()
+    return admin_token
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def children_rss_mb(pid: int) -> float:
+    """RSS of the report worker processes of the worker"""
+    total = 0.0
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as children:
+            for child in children.read().split():
+                try:
+                    total += rss_mb(int(child))
+                except FileNotFoundError:
+                    pass
+    return total
+
+
+async def measure_startup(src_dir: str, env: dict, token: str) -> dict:
+    port = free_port()
+    started = time.perf_counter()
+    worker = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        cwd=src_dir,
+        env={**os.environ, **env},
+    )
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", timeout=None
+        ) as client:
+            while True:
+                try:
+                    response = await client.get("/")
+                    if response.status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if worker.poll() is not None:
+                    raise RuntimeError(f"The worker in {src_dir} exited")
+                await asyncio.sleep(0.01)
+            first_request = time.perf_counter() - started
+            worker_rss = rss_mb(worker.pid)
+            report_workers_rss = children_rss_mb(worker.pid)
+
+            report_started = time.perf_counter()
+            response = await client.get(
+                "/surveys/1/report",
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            assert response.status_code == 200, response.text
+            first_report = time.perf_counter() - report_started
+    finally:
+        worker.terminate()
+        worker.wait()
+
+    return {
+        "time_to_first_request_s": first_request,
+        "worker_rss_mb": worker_rss,
+        "report_workers_rss_mb": report_workers_rss,
+        "first_report_s": first_report,
+    }
+
+
+def summarize_runs(runs: list[dict]) -> dict:
+    return {
+        key: {
+            "median": statistics.median(run[key] for run in runs),
+            "min": min(run[key] for run in runs),
+            "max": max(run[key] for run in runs),
+        }
+        for key in runs[0]
+    }
+
+
+async def main(args: argparse.Namespace):
+    token = await seed()
+    targets = {
+        "current": (SRC_DIR, {}),
+        "current_preload": (SRC_DIR, {"REPORT_PRELOAD": "true"}),
+    }
+    worktree = None
+    if args.baseline_ref:
+        worktree = tempfile.mkdtemp(prefix="io-lab-baseline-")
+        subprocess.run(
+            [
+                "git",
+                "worktree",
+                "add",
+                "--detach",
+                worktree,
+                args.baseline_ref,
+            ],
+            cwd=REPO_DIR,
+            check=True,
+            capture_output=True,
+        )
+        targets = {"baseline": (os.path.join(worktree, "src"), {}), **targets}
+
+    results = {}
+    try:
+        for name, (src_dir, env) in targets.items():
+            # Runs of the targets are not interleaved, the first one warms
+            # up the OS file cache
+            await measure_startup(src_dir, env, token)
+            results[name] = summarize_runs(
+                [
+                    await measure_startup(src_dir, env, token)
+                    for _ in range(args.runs)
+                ]
+            )
+    finally:
+        if worktree is not None:
+            subprocess.run(
+                ["git", "worktree", "remove", "--force", worktree],
+                cwd=REPO_DIR,
+                check=True,
+            )
+    print(
+        json.dumps(
+            {"baseline_ref": args.baseline_ref, "results": results}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline-ref", help="Commit to compare with")
+    parser.add_argument("--runs", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
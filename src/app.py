@@ -1,17 +1,32 @@
+import asyncio
 import logging
 import sys
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi_responses import custom_openapi
+from sqlalchemy.exc import OperationalError
 
 from config import app_config, session_manager
+from metrics import MetricsMiddleware, instrument_engine, metrics
+from middleware import ETagMiddleware
+from profiler import SlowRequestMiddleware, slow_request_monitor
+from routes.debug import router as DebugRouter
 from routes.grades import router as GradesRouter
 from routes.surveys import router as SurveysRouter
 from routes.users import router as UsersRouter
-
-# from routes.debug import router as DebugRouter
+from services.auth import (
+    MetricsAccessCheckDep,
+    user_token_versions,
+    verified_token_cache,
+)
+from services.grade_buffer import grade_buffer
+from services.live_results import live_results
+from services.passwords import password_hasher
+from services.reports import report_jobs
+from services.surveys import survey_cache
 
 logging.basicConfig(
     stream=sys.stdout,
@@ -25,7 +40,23 @@ async def lifespan(app: FastAPI):
     Function that handles startup and shutdown events.
     To understand more, read https://fastapi.tiangolo.com/advanced/events/
     """
+    # Keep the in-process token revocation list in sync with the DB
+    token_versions_sync = asyncio.create_task(
+        user_token_versions.keep_in_sync(
+            app_config.TOKEN_REVOCATION_SYNC_SECONDS
+        )
+    )
+    if app_config.REPORT_PRELOAD:
+        await report_jobs.preload()
     yield
+    token_versions_sync.cancel()
+    # Stop the live results publishers and end their streams
+    live_results.shutdown()
+    # Store the votes still queued before the DB connection is closed
+    await grade_buffer.shutdown()
+    # Wait for in-flight bcrypt calls and stop the hashing workers
+    password_hasher.shutdown()
+    report_jobs.shutdown()
     if session_manager._engine is not None:
         # Close the DB connection
         await session_manager.close()
@@ -33,6 +64,8 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(
     lifespan=lifespan,
+    # Responses of routes returning models are encoded by orjson
+    default_response_class=ORJSONResponse,
     docs_url=None if app_config.ENVIRONMENT == "production" else "/docs",
 )
 app.openapi = custom_openapi(app)
@@ -45,6 +78,38 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Conditional GETs, Cache-Control is set per route with CacheControlDep
+app.add_middleware(ETagMiddleware)
+
+if app_config.SLOW_REQUEST_THRESHOLD_MS > 0:
+    app.add_middleware(SlowRequestMiddleware, monitor=slow_request_monitor)
+
+if app_config.METRICS_ENABLED:
+    instrument_engine(session_manager._engine)
+    metrics.register_collector("password_hasher", password_hasher.stats)
+    metrics.register_collector("jwt_cache", verified_token_cache.stats)
+    metrics.register_collector("token_versions", user_token_versions.stats)
+    metrics.register_collector("survey_cache", survey_cache.stats)
+    metrics.register_collector("grade_buffer", grade_buffer.stats)
+    metrics.register_collector("live_results", live_results.stats)
+    # Added last, so that it wraps the other middlewares too
+    app.add_middleware(
+        MetricsMiddleware,
+        query_budget=app_config.QUERY_BUDGET_PER_REQUEST,
+    )
+
+
+@app.exception_handler(OperationalError)
+async def database_locked_handler(request: Request, error: OperationalError):
+    """SQLite gave up waiting SQLITE_BUSY_TIMEOUT_MS for the write lock, the
+    request can be retried"""
+    if "database is locked" not in str(error.orig):
+        raise error
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "The database is busy, retry the request"},
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.get("/", tags=["Index"])
@@ -52,7 +117,24 @@ async def read_root():
     return {"cool": True}
 
 
+if app_config.METRICS_ENABLED and app_config.METRICS_TOKEN:
+
+    @app.get(
+        "/metrics",
+        tags=["Index"],
+        response_class=PlainTextResponse,
+        responses={401: {}, 403: {}},
+        dependencies=[MetricsAccessCheckDep],
+    )
+    async def read_metrics():
+        """Metrics of this worker in the Prometheus text format, scraped
+        with METRICS_TOKEN as the bearer token"""
+        return PlainTextResponse(
+            metrics.render(), media_type="text/plain; version=0.0.4"
+        )
+
+
 app.include_router(UsersRouter, tags=["Users"], prefix="/users")
 app.include_router(SurveysRouter, tags=["Surveys"], prefix="/surveys")
 app.include_router(GradesRouter, tags=["Grades"], prefix="/grades")
-# app.include_router(DebugRouter, tags=["Debug"], prefix="/debug")
+app.include_router(DebugRouter, tags=["Debug"], prefix="/debug")
@@ -1,9 +1,10 @@
 from contextlib import asynccontextmanager
-from typing import Annotated, Any, AsyncIterator, Optional
+from typing import Annotated, Any, AsyncIterator, Literal, Optional
 
 from fastapi import Depends
 from passlib.context import CryptContext
 from pydantic_settings import BaseSettings
+from sqlalchemy import AsyncAdaptedQueuePool, event
 from sqlalchemy.ext.asyncio import (
     AsyncConnection,
     AsyncSession,
@@ -14,11 +15,81 @@ from sqlalchemy.ext.asyncio import (
 
 class AppConfig(BaseSettings):
     ENVIRONMENT: str = "develop"
+    # Server started by main.py, the SERVER_* tuning below only applies
+    # when ENVIRONMENT is "production", otherwise a single worker with the
+    # auto-reloader is started
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8080
+    # None starts a worker per CPU
+    SERVER_WORKERS: Optional[int] = None
+    SERVER_LOOP: Literal["auto", "asyncio", "uvloop"] = "uvloop"
+    SERVER_HTTP: Literal["auto", "h11", "httptools"] = "httptools"
+    # Keep it above the idle timeout of the load balancer in front
+    SERVER_KEEP_ALIVE_SECONDS: int = 65
+    SERVER_BACKLOG: int = 2048
+    # Time given to in-flight requests on shutdown, before the lifespan
+    # shutdown stores queued votes and closes the DB engine
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS: int = 30
     PYTHONPATH: str = "./src"
     DATABASE_URL: str = "sqlite:///./database.sqlite"
     JWT_SECRET_KEY: Optional[str] = None
+    # Number of verified tokens kept in memory per worker, 0 disables it
+    JWT_CACHE_SIZE: int = 10000
+    JWT_ACCESS_EXPIRES_SECONDS: int = 2400
+    JWT_REFRESH_EXPIRES_SECONDS: int = 14 * 24 * 3600
+    # How often every worker reloads user token versions from the DB
+    TOKEN_REVOCATION_SYNC_SECONDS: float = 30
     DEBUG_LOGS: bool = False
     ECHO_SQL: bool = False
+    METRICS_ENABLED: bool = True
+    # Bearer token Prometheus scrapes /metrics with, which is not served
+    # without one
+    METRICS_TOKEN: Optional[str] = None
+    # Requests running more SQL statements are logged, 0 disables it
+    QUERY_BUDGET_PER_REQUEST: int = 10
+    PROFILER_MAX_SECONDS: int = 60
+    # Stacks of requests slower than this are captured, 0 disables it
+    SLOW_REQUEST_THRESHOLD_MS: int = 2000
+    SLOW_REQUEST_CAPTURES: int = 50
+    PASSWORD_HASHING_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASHING_WORKERS: int = 4
+    PASSWORD_HASHING_MAX_CONCURRENCY: int = 8
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    # Applied through PRAGMAs on every new SQLite connection, None skips one
+    SQLITE_JOURNAL_MODE: Optional[str] = "WAL"
+    SQLITE_SYNCHRONOUS: Optional[str] = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: Optional[int] = 5000
+    SQLITE_MMAP_SIZE: Optional[int] = 268435456
+    # "memory" caches surveys per worker, "shared" in SURVEY_CACHE_URL
+    # (Redis) or in a local stand-in when no URL is set
+    SURVEY_CACHE_BACKEND: Literal["memory", "shared", "none"] = "memory"
+    SURVEY_CACHE_URL: Optional[str] = None
+    SURVEY_CACHE_SIZE: int = 1024
+    SURVEY_CACHE_TTL_SECONDS: int = 60
+    GRADES_BULK_MAX_ITEMS: int = 5000
+    # Width of the time buckets of survey_tallies, changing it requires
+    # rebuilding the tallies (python src/tallies.py rebuild)
+    SURVEY_TALLY_BUCKET_SECONDS: int = 300
+    # Write-behind queue for POST /grades/, see services/grade_buffer.py
+    GRADE_BUFFER_ENABLED: bool = False
+    GRADE_BUFFER_FLUSH_MS: int = 50
+    GRADE_BUFFER_MAX_BATCH: int = 500
+    GRADE_BUFFER_ACK: Literal["queued", "committed"] = "committed"
+    # GET /surveys/{id}/live, see services/live_results.py
+    LIVE_RESULTS_INTERVAL_MS: int = 1000
+    LIVE_RESULTS_RESYNC_SECONDS: int = 30
+    LIVE_RESULTS_HEARTBEAT_SECONDS: int = 15
+    REPORT_WORKERS: int = 1
+    # Start the report workers with the app instead of on the first report
+    REPORT_PRELOAD: bool = False
+    REPORT_CACHE_SIZE: int = 32
+    REPORT_JOBS_LIMIT: int = 256
+    REPORT_HISTOGRAM_BINS: int = 20
 
     class Config:
         env_file = ".env"
@@ -30,13 +101,57 @@ app_config = AppConfig()
 # Heavily inspired by https://praciano.com.br/fastapi-and-async-sqlalchemy-20-with-pytest-done-right.html
 
 
+def get_engine_kwargs(config: AppConfig) -> dict[str, Any]:
+    engine_kwargs: dict[str, Any] = {
+        "echo": config.ECHO_SQL,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "query_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+    }
+    # In-memory SQLite shares a single connection, there is no pool to size
+    if ":memory:" not in config.DATABASE_URL:
+        # File based aiosqlite defaults to NullPool, which reconnects (and
+        # reruns the PRAGMAs) on every checkout
+        engine_kwargs["poolclass"] = AsyncAdaptedQueuePool
+        engine_kwargs["pool_size"] = config.DB_POOL_SIZE
+        engine_kwargs["max_overflow"] = config.DB_MAX_OVERFLOW
+        engine_kwargs["pool_timeout"] = config.DB_POOL_TIMEOUT
+    return engine_kwargs
+
+
+def get_sqlite_pragmas(config: AppConfig) -> dict[str, Any]:
+    pragmas = {
+        "journal_mode": config.SQLITE_JOURNAL_MODE,
+        "synchronous": config.SQLITE_SYNCHRONOUS,
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+    }
+    return {
+        name: value for name, value in pragmas.items() if value is not None
+    }
+
+
 class DatabaseSessionManager:
-    def __init__(self, host: str, engine_kwargs: dict[str, Any] = {}):
+    def __init__(
+        self,
+        host: str,
+        engine_kwargs: dict[str, Any] = {},
+        sqlite_pragmas: dict[str, Any] = {},
+    ):
         self._engine = create_async_engine(host, **engine_kwargs)
         self._sessionmaker = async_sessionmaker(
             autocommit=False, bind=self._engine
         )
 
+        if self._engine.dialect.name == "sqlite" and sqlite_pragmas:
+
+            @event.listens_for(self._engine.sync_engine, "connect")
+            def set_sqlite_pragmas(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                for name, value in sqlite_pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+                cursor.close()
+
     async def close(self):
         if self._engine is None:
             raise Exception("DatabaseSessionManager is not initialized")
@@ -73,7 +188,9 @@ class DatabaseSessionManager:
 
 
 session_manager = DatabaseSessionManager(
-    app_config.DATABASE_URL, {"echo": app_config.ECHO_SQL}
+    app_config.DATABASE_URL,
+    get_engine_kwargs(app_config),
+    get_sqlite_pragmas(app_config),
 )
 
 
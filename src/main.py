@@ -1,4 +1,70 @@
+import os
+
 import uvicorn
+from uvicorn.supervisors import ChangeReload, Multiprocess
+
+from config import AppConfig, app_config
+
+
+class DrainingServer(uvicorn.Server):
+    """On shutdown uvicorn stops accepting connections, waits for the open
+    ones to finish and then runs the app's lifespan shutdown. The live
+    result streams never finish on their own, so they are ended first
+    instead of holding the drain until its timeout."""
+
+    async def shutdown(self, sockets=None):
+        # Imported here, the supervisor process never loads the app
+        from services.live_results import live_results
+
+        live_results.shutdown()
+        await super().shutdown(sockets)
+
+
+class DrainingMultiprocess(Multiprocess):
+    def shutdown(self):
+        # All workers drain at the same time rather than one after another
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+
+
+def get_server_config(config: AppConfig) -> uvicorn.Config:
+    if config.ENVIRONMENT != "production":
+        return uvicorn.Config(
+            "app:app",
+            host=config.SERVER_HOST,
+            port=config.SERVER_PORT,
+            reload=True,
+        )
+
+    return uvicorn.Config(
+        "app:app",
+        host=config.SERVER_HOST,
+        port=config.SERVER_PORT,
+        workers=config.SERVER_WORKERS or os.cpu_count() or 1,
+        loop=config.SERVER_LOOP,
+        http=config.SERVER_HTTP,
+        timeout_keep_alive=config.SERVER_KEEP_ALIVE_SECONDS,
+        backlog=config.SERVER_BACKLOG,
+        timeout_graceful_shutdown=config.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+    )
+
+
+def run_server(config: AppConfig):
+    server_config = get_server_config(config)
+    server = DrainingServer(server_config)
+    if server_config.should_reload:
+        sock = server_config.bind_socket()
+        ChangeReload(server_config, target=server.run, sockets=[sock]).run()
+    elif server_config.workers > 1:
+        sock = server_config.bind_socket()
+        DrainingMultiprocess(
+            server_config, target=server.run, sockets=[sock]
+        ).run()
+    else:
+        server.run()
+
 
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=8080, reload=True)
+    run_server(app_config)
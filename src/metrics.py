@@ -0,0 +1,315 @@
+import asyncio
+import bisect
+import logging
+import time
+from contextvars import Context, ContextVar
+from typing import Any, Callable, Coroutine, Iterable, Mapping
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Label of requests that did not match any route, e.g. 404s
+UNMATCHED_ROUTE = "<unmatched>"
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        # The last slot counts the values above the highest bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestQueryStats:
+    """SQL statements run while handling the current request"""
+
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+current_query_stats: ContextVar[RequestQueryStats | None] = ContextVar(
+    "current_query_stats", default=None
+)
+
+
+def create_background_task(
+    coroutine: Coroutine[Any, Any, Any],
+) -> asyncio.Task:
+    """Starts a task that outlives the request starting it in an empty
+    context, so that its statements are not counted for that request"""
+    return Context().run(asyncio.create_task, coroutine)
+
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape_label_value(value)}"' for name, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Per-process request and DB metrics, rendered in the Prometheus text
+    exposition format by ``render``."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests: dict[Labels, int] = {}
+        self.latency: dict[Labels, Histogram] = {}
+        self.db_statements: dict[Labels, Histogram] = {}
+        self.db_seconds: dict[Labels, float] = {}
+        self.over_query_budget: dict[Labels, int] = {}
+        # Statements run outside of requests too, e.g. by background tasks
+        self.db_statements_total = 0
+        self.db_seconds_total = 0.0
+        self._collectors: dict[str, Callable[[], Mapping]] = {}
+
+    def register_collector(self, prefix: str, stats: Callable[[], Mapping]):
+        """Exposes the numeric fields of ``stats()`` as gauges"""
+        self._collectors[prefix] = stats
+
+    def observe_query(self, seconds: float):
+        self.db_statements_total += 1
+        self.db_seconds_total += seconds
+
+    def observe_request(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        seconds: float,
+        query_stats: RequestQueryStats,
+        over_query_budget: bool,
+    ):
+        labels: Labels = (("method", method), ("route", route))
+        status_labels = labels + (("status", str(status)),)
+        self.requests[status_labels] = self.requests.get(status_labels, 0) + 1
+
+        if labels not in self.latency:
+            self.latency[labels] = Histogram(LATENCY_BUCKETS)
+            self.db_statements[labels] = Histogram(STATEMENT_BUCKETS)
+        self.latency[labels].observe(seconds)
+        self.db_statements[labels].observe(query_stats.statements)
+        self.db_seconds[labels] = (
+            self.db_seconds.get(labels, 0.0) + query_stats.seconds
+        )
+        if over_query_budget:
+            self.over_query_budget[labels] = (
+                self.over_query_budget.get(labels, 0) + 1
+            )
+
+    def render(self) -> str:
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, help: str):
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def samples(name: str, values: Mapping[Labels, float]):
+            for labels, value in values.items():
+                lines.append(
+                    f"{name}{format_labels(labels)} {format_value(value)}"
+                )
+
+        def histograms(name: str, values: Mapping[Labels, Histogram]):
+            for labels, histogram in values.items():
+                cumulative = 0
+                for bound, count in zip(
+                    (*histogram.buckets, "+Inf"), histogram.counts
+                ):
+                    cumulative += count
+                    bucket_labels = labels + (("le", str(bound)),)
+                    lines.append(
+                        f"{name}_bucket{format_labels(bucket_labels)} "
+                        f"{cumulative}"
+                    )
+                lines.append(
+                    f"{name}_sum{format_labels(labels)} "
+                    f"{format_value(histogram.sum)}"
+                )
+                lines.append(
+                    f"{name}_count{format_labels(labels)} {histogram.count}"
+                )
+
+        metric("http_requests_in_flight", "gauge", "Requests being handled.")
+        samples("http_requests_in_flight", {(): self.in_flight})
+        metric("http_requests_total", "counter", "Handled requests.")
+        samples("http_requests_total", self.requests)
+        metric(
+            "http_request_duration_seconds",
+            "histogram",
+            "Time spent handling a request.",
+        )
+        histograms("http_request_duration_seconds", self.latency)
+        metric(
+            "http_request_db_statements",
+            "histogram",
+            "SQL statements run per request.",
+        )
+        histograms("http_request_db_statements", self.db_statements)
+        metric(
+            "http_request_db_seconds_total",
+            "counter",
+            "Time spent running SQL statements of requests.",
+        )
+        samples("http_request_db_seconds_total", self.db_seconds)
+        metric(
+            "http_requests_over_query_budget_total",
+            "counter",
+            "Requests that ran more SQL statements than the query budget.",
+        )
+        samples(
+            "http_requests_over_query_budget_total", self.over_query_budget
+        )
+        metric("db_statements_total", "counter", "SQL statements run.")
+        samples("db_statements_total", {(): self.db_statements_total})
+        metric(
+            "db_statement_seconds_total",
+            "counter",
+            "Time spent running SQL statements.",
+        )
+        samples("db_statement_seconds_total", {(): self.db_seconds_total})
+
+        for prefix, stats in self._collectors.items():
+            for key, value in stats().items():
+                if isinstance(value, bool) or not isinstance(
+                    value, (int, float)
+                ):
+                    continue
+                name = f"{prefix}_{key}"
+                metric(name, "gauge", f"{key} reported by {prefix}.")
+                samples(name, {(): value})
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def instrument_engine(
+    engine: AsyncEngine, registry: MetricsRegistry = metrics
+):
+    """Counts the SQL statements run by the engine and the time they take,
+    per request and in total"""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def start_query_timer(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        connection.info.setdefault("query_started_at", []).append(
+            time.perf_counter()
+        )
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def stop_query_timer(
+        connection, cursor, statement, parameters, context, executemany
+    ):
+        seconds = (
+            time.perf_counter() - connection.info["query_started_at"].pop()
+        )
+        registry.observe_query(seconds)
+        query_stats = current_query_stats.get()
+        if query_stats is not None:
+            query_stats.statements += 1
+            query_stats.seconds += seconds
+
+
+class MetricsMiddleware:
+    """Records latency, status, in-flight count and SQL statements of every
+    request, and logs the routes running more statements than
+    ``query_budget`` (0 disables the check)."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        query_budget: int = 0,
+        registry: MetricsRegistry = metrics,
+    ):
+        self.app = app
+        self.query_budget = query_budget
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        query_stats = RequestQueryStats()
+        token = current_query_stats.set(query_stats)
+        self.registry.in_flight += 1
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started_at
+            self.registry.in_flight -= 1
+            current_query_stats.reset(token)
+
+            # Set by the router once the request matched a route
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            over_query_budget = (
+                self.query_budget > 0
+                and query_stats.statements > self.query_budget
+            )
+            if over_query_budget:
+                logger.warning(
+                    "%s %s ran %d SQL statements, the budget is %d",
+                    scope["method"],
+                    route,
+                    query_stats.statements,
+                    self.query_budget,
+                )
+            self.registry.observe_request(
+                scope["method"],
+                route,
+                status,
+                seconds,
+                query_stats,
+                over_query_budget,
+            )
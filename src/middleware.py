@@ -0,0 +1,85 @@
+import hashlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Kept on 304 responses, everything describing the body is dropped
+NOT_MODIFIED_HEADERS = ("cache-control", "etag", "vary", "expires")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ETagMiddleware:
+    """Adds an ETag to the JSON responses of GET requests and answers
+    ``304 Not Modified`` without a body when it matches ``If-None-Match``.
+
+    The ETag is a hash of the response body, the models have no row
+    version to derive it from. Streamed and non-JSON responses, e.g. the
+    NDJSON exports and PDF reports, are passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start_message: Message | None = None
+        body_parts: list[bytes] = []
+
+        async def send_with_etag(message: Message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if (
+                    message["status"] == 200
+                    and headers.get("content-type", "").startswith(
+                        "application/json"
+                    )
+                    and "etag" not in headers
+                ):
+                    # Held back until the whole body is known
+                    start_message = message
+                    return
+            elif message["type"] == "http.response.body" and start_message:
+                body_parts.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+                await send_buffered_response(b"".join(body_parts))
+                return
+            await send(message)
+
+        async def send_buffered_response(body: bytes):
+            etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["etag"] = etag
+            start_message["headers"] = headers.raw
+
+            if if_none_match and etag_matches(if_none_match, etag):
+                await send(
+                    {
+                        "type": "http.response.start",
+                        "status": 304,
+                        "headers": [
+                            (name, value)
+                            for name, value in headers.raw
+                            if name.decode() in NOT_MODIFIED_HEADERS
+                        ],
+                    }
+                )
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_with_etag)
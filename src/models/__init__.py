@@ -4,4 +4,5 @@ Base = declarative_base()
 
 from models.grades import Grade
 from models.surveys import Survey
+from models.tallies import SurveyTally, SurveyTallyBucket
 from models.user import User
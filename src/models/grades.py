@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import func
+from sqlalchemy import Index, func
 from sqlalchemy.orm import Mapped, mapped_column
 
 from . import Base
@@ -8,6 +8,12 @@ from . import Base
 
 class Grade(Base):
     __tablename__ = "grades"
+    __table_args__ = (
+        Index(
+            "ix_grades_survey_id_user_id", "survey_id", "user_id", unique=True
+        ),
+        Index("ix_grades_survey_id_created_at", "survey_id", "created_at"),
+    )
     id: Mapped[int] = mapped_column(
         primary_key=True, index=True, autoincrement=True
     )
@@ -1,5 +1,6 @@
 import datetime
 
+from sqlalchemy import Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from . import Base
@@ -7,6 +8,9 @@ from . import Base
 
 class Survey(Base):
     __tablename__ = "surveys"
+    __table_args__ = (
+        Index("ix_surveys_start_at_finishes_at", "start_at", "finishes_at"),
+    )
     id: Mapped[int] = mapped_column(
         primary_key=True, index=True, autoincrement=True
     )
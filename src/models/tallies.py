@@ -0,0 +1,25 @@
+import datetime
+
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import Base
+
+
+class SurveyTally(Base):
+    """Number of votes of every grade of a survey, kept in step with the
+    grades table by every write of a grade"""
+
+    __tablename__ = "survey_tallies"
+    survey_id: Mapped[int] = mapped_column(primary_key=True)
+    grade: Mapped[int] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(default=0)
+
+
+class SurveyTallyBucket(Base):
+    """Number of votes of a survey per SURVEY_TALLY_BUCKET_SECONDS wide
+    time bucket, starting at ``bucket_start``"""
+
+    __tablename__ = "survey_tally_buckets"
+    survey_id: Mapped[int] = mapped_column(primary_key=True)
+    bucket_start: Mapped[datetime.datetime] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(default=0)
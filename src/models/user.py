@@ -5,6 +5,9 @@ from . import Base
 
 class User(Base):
     __tablename__ = "users"
+    # Ids of deleted users must not be handed out again, their tokens
+    # would become valid for the new user
+    __table_args__ = {"sqlite_autoincrement": True}
     id: Mapped[int] = mapped_column(
         primary_key=True, index=True, autoincrement=True
     )
@@ -13,3 +16,5 @@ class User(Base):
     last_name: Mapped[str]
     password_hash: Mapped[str]
     is_admin: Mapped[bool] = mapped_column(default=False)
+    # Bumped to revoke every token issued to the user before the change
+    token_version: Mapped[int] = mapped_column(default=0, server_default="0")
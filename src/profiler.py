@@ -0,0 +1,231 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from types import FrameType
+from typing import Any, TypedDict
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import app_config
+
+# Deeper stacks are cut at the root, the frames closest to the leaf are kept
+MAX_STACK_DEPTH = 128
+
+
+def describe_code(frame: FrameType, line: bool = False) -> str:
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    lineno = frame.f_lineno if line else code.co_firstlineno
+    return f"{code.co_name} ({filename}:{lineno})"
+
+
+def frame_stack(frame: FrameType | None) -> list[str]:
+    """Root first stack of the frame, one entry per function"""
+    stack: list[str] = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        stack.append(describe_code(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def coroutine_stack(coroutine: Any) -> list[str]:
+    """Await chain of a suspended coroutine, the outermost call first"""
+    stack: list[str] = []
+    while coroutine is not None and len(stack) < MAX_STACK_DEPTH:
+        frame = getattr(coroutine, "cr_frame", None) or getattr(
+            coroutine, "gi_frame", None
+        )
+        if frame is None:
+            break
+        stack.append(describe_code(frame, line=True))
+        coroutine = getattr(coroutine, "cr_await", None) or getattr(
+            coroutine, "gi_yieldfrom", None
+        )
+    return stack
+
+
+def render_collapsed(counts: Counter[str]) -> str:
+    """Brendan Gregg's collapsed stack format, readable by flamegraph.pl
+    and speedscope"""
+    return "".join(
+        f"{stack} {count}\n" for stack, count in counts.most_common()
+    )
+
+
+class ProfilerBusyError(Exception):
+    pass
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread of the worker from a thread of
+    its own, so a blocked event loop is sampled as well"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def sample(self, seconds: float, interval: float) -> Counter[str]:
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError()
+        try:
+            own_thread_id = threading.get_ident()
+            counts: Counter[str] = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                thread_names = {
+                    thread.ident: thread.name
+                    for thread in threading.enumerate()
+                }
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread_id:
+                        continue
+                    thread_name = thread_names.get(thread_id, str(thread_id))
+                    counts[";".join([thread_name, *frame_stack(frame)])] += 1
+                time.sleep(interval)
+            return counts
+        finally:
+            self._lock.release()
+
+
+sampling_profiler = SamplingProfiler()
+
+
+class SlowRequestCapture(TypedDict):
+    method: str
+    path: str
+    captured_at: float
+    elapsed_ms: float
+    duration_ms: float | None
+    loop_stack: list[str]
+    task_stack: list[str]
+
+
+class InFlightRequest:
+    __slots__ = ("method", "path", "started_at", "task", "capture")
+
+    def __init__(self, method: str, path: str, task: asyncio.Task | None):
+        self.method = method
+        self.path = path
+        self.started_at = time.monotonic()
+        self.task = task
+        self.capture: SlowRequestCapture | None = None
+
+
+class SlowRequestMonitor:
+    """Captures the stacks of requests running longer than the threshold.
+
+    A watchdog thread checks the requests in flight. For a slow one it
+    records the stack of the event loop thread, which shows what blocks the
+    loop, and the await chain of the request's task, which shows what the
+    request waits for. Only the last ``max_captures`` captures are kept.
+    """
+
+    def __init__(self, threshold_ms: int, max_captures: int):
+        self._threshold = threshold_ms / 1000
+        self.captures: deque[SlowRequestCapture] = deque(maxlen=max_captures)
+        self._in_flight: dict[int, InFlightRequest] = {}
+        self._lock = threading.Lock()
+        self._loop_thread_id: int | None = None
+        self._watchdog: threading.Thread | None = None
+
+    def start_request(self, method: str, path: str) -> InFlightRequest:
+        if self._watchdog is None:
+            self._loop_thread_id = threading.get_ident()
+            self._watchdog = threading.Thread(
+                target=self._watch, name="slow-request-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+        request = InFlightRequest(method, path, asyncio.current_task())
+        with self._lock:
+            self._in_flight[id(request)] = request
+        return request
+
+    def finish_request(self, request: InFlightRequest):
+        with self._lock:
+            if self._in_flight.pop(id(request), None) is None:
+                return
+            if request.capture is not None:
+                request.capture["duration_ms"] = (
+                    time.monotonic() - request.started_at
+                ) * 1000
+
+    def get_captures(self) -> list[SlowRequestCapture]:
+        """Copies of the captures, newest first"""
+        with self._lock:
+            return [dict(capture) for capture in reversed(self.captures)]
+
+    def _watch(self):
+        interval = min(max(self._threshold / 4, 0.01), 1.0)
+        while True:
+            time.sleep(interval)
+            now = time.monotonic()
+            with self._lock:
+                slow_requests = [
+                    request
+                    for request in self._in_flight.values()
+                    if request.capture is None
+                    and now - request.started_at >= self._threshold
+                ]
+                for request in slow_requests:
+                    request.capture = self._capture(request, now)
+                    self.captures.append(request.capture)
+
+    def _capture(
+        self, request: InFlightRequest, now: float
+    ) -> SlowRequestCapture:
+        loop_frame = sys._current_frames().get(self._loop_thread_id)
+        try:
+            task_stack = (
+                coroutine_stack(request.task.get_coro())
+                if request.task is not None
+                else []
+            )
+        except Exception:
+            # The task is resumed by the loop thread while being walked
+            task_stack = []
+        return {
+            "method": request.method,
+            "path": request.path,
+            "captured_at": time.time(),
+            "elapsed_ms": (now - request.started_at) * 1000,
+            "duration_ms": None,
+            "loop_stack": frame_stack(loop_frame),
+            "task_stack": task_stack,
+        }
+
+
+slow_request_monitor = SlowRequestMonitor(
+    app_config.SLOW_REQUEST_THRESHOLD_MS, app_config.SLOW_REQUEST_CAPTURES
+)
+
+
+class SlowRequestMiddleware:
+    def __init__(self, app: ASGIApp, monitor: SlowRequestMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = self.monitor.start_request(scope["method"], scope["path"])
+
+        async def send_until_streaming(message: Message):
+            if message["type"] == "http.response.start" and Headers(
+                raw=message["headers"]
+            ).get("content-type", "").startswith("text/event-stream"):
+                # Event streams stay open on purpose, they are only timed
+                # until their headers are sent
+                self.monitor.finish_request(request)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_until_streaming)
+        finally:
+            self.monitor.finish_request(request)
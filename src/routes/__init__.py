@@ -1,6 +1,15 @@
-from fastapi import Query
+from typing import Any, AsyncIterator, Callable, Optional
 
-from schemas.pagination import PaginationParamsSchema
+from fastapi import Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import session_manager
+from schemas.pagination import (
+    CursorPaginationParamsSchema,
+    PaginationParamsSchema,
+)
 
 
 def PaginationParamsDep(
@@ -8,3 +17,68 @@ def PaginationParamsDep(
     limit: int = Query(ge=1, le=100, required=False, default=20),
 ):
     return PaginationParamsSchema(page=page, limit=limit)
+
+
+def CursorPaginationParamsDep(
+    after: Optional[int] = Query(ge=0, required=False, default=None),
+    limit: int = Query(ge=1, le=100, required=False, default=20),
+    with_total: bool = Query(alias="withTotal", required=False, default=False),
+):
+    return CursorPaginationParamsSchema(
+        after=after, limit=limit, with_total=with_total
+    )
+
+
+def CacheControlDep(cache_control: str):
+    """Sets the Cache-Control header of a route, e.g.
+    ``dependencies=[CacheControlDep("private, no-cache")]``"""
+
+    def set_cache_control(response: Response):
+        response.headers["Cache-Control"] = cache_control
+
+    return Depends(set_cache_control)
+
+
+def json_response(
+    serializer: TypeAdapter, content: Any, response: Optional[Response] = None
+) -> Response:
+    """Validates ORM objects with a pre-built ``TypeAdapter`` and dumps
+    them to JSON bytes in one go, instead of FastAPI validating them
+    against ``response_model``, converting them to dicts and encoding those.
+
+    Keep ``response_model`` on the route for the OpenAPI schema. FastAPI
+    sends a returned response as is, so the headers that dependencies set
+    on ``response``, e.g. by CacheControlDep, are copied over.
+    """
+    json_response = Response(
+        serializer.dump_json(
+            serializer.validate_python(content, from_attributes=True),
+            by_alias=True,
+        ),
+        media_type="application/json",
+    )
+    if response is not None:
+        json_response.headers.update(response.headers)
+    return json_response
+
+
+def ndjson_export_response(
+    stream: Callable[[AsyncSession], AsyncIterator[Any]],
+    schema: type[BaseModel],
+) -> StreamingResponse:
+    """Stream entities as newline-delimited JSON, one schema per line.
+
+    The generator opens its own DB session, because request-scoped
+    dependencies are closed before a streaming response body is sent.
+    """
+
+    async def generate_lines() -> AsyncIterator[str]:
+        async with session_manager.session() as db_session:
+            async for entity in stream(db_session):
+                yield schema.model_validate(
+                    entity, from_attributes=True
+                ).model_dump_json(by_alias=True) + "\n"
+
+    return StreamingResponse(
+        generate_lines(), media_type="application/x-ndjson"
+    )
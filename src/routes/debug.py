@@ -0,0 +1,57 @@
+import asyncio
+from typing import Sequence
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from config import app_config
+from profiler import (
+    ProfilerBusyError,
+    render_collapsed,
+    sampling_profiler,
+    slow_request_monitor,
+)
+from schemas.debug import SlowRequestCaptureSchema
+from services.auth import AdminAccessCheckDep
+
+router = APIRouter()
+
+
+@router.get(
+    "/profile",
+    status_code=200,
+    response_class=PlainTextResponse,
+    responses={401: {}, 409: {}},
+    dependencies=[AdminAccessCheckDep],
+)
+async def profile_worker(
+    seconds: float = Query(
+        gt=0, le=app_config.PROFILER_MAX_SECONDS, required=False, default=5
+    ),
+    interval_ms: float = Query(
+        alias="intervalMs", ge=1, le=1000, required=False, default=10
+    ),
+):
+    """Samples the stacks of every thread of the worker handling the request
+    and returns them in the collapsed format used by flame graph tools"""
+    try:
+        counts = await asyncio.to_thread(
+            sampling_profiler.sample, seconds, interval_ms / 1000
+        )
+    except ProfilerBusyError:
+        raise HTTPException(
+            status_code=409, detail="The worker is already being profiled"
+        )
+    return PlainTextResponse(render_collapsed(counts))
+
+
+@router.get(
+    "/slow-requests",
+    status_code=200,
+    response_model=Sequence[SlowRequestCaptureSchema],
+    responses={401: {}},
+    dependencies=[AdminAccessCheckDep],
+)
+async def get_slow_requests():
+    """Stacks captured for the latest slow requests, newest first"""
+    return slow_request_monitor.get_captures()
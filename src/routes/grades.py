@@ -1,29 +1,105 @@
 from typing import Annotated
 
-from fastapi import APIRouter, BackgroundTasks, Body, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Body, HTTPException, Response
 
 import services.grades as GradeService
-from config import DBSessionDep, hash_helper
+from config import DBSessionDep, app_config, hash_helper
 from models.surveys import Survey
-from schemas.grades import GradeSchema
+from schemas.grades import GradeBulkResultSchema, GradeBulkSchema, GradeSchema
 from services.auth import (
     AdminAccessCheckDep,
     AuthJWTTokenPayload,
     AuthJWTTokenValidatorDep,
     construct_auth_jwt,
 )
+from services.grade_buffer import grade_buffer
+from services.grades import GradeRejectedError
+from services.live_results import live_results
 
 router = APIRouter()
 
+# Status code and detail of the response to every GradeRejectedError
+grade_rejection_errors = {
+    "survey_not_found": (404, "No survey found"),
+    "survey_closed": (400, "The survey is not open for grading"),
+    "duplicate": (409, "The survey has already been graded by this user"),
+}
 
-@router.post("/", status_code=201)
+
+def grade_rejected(error: GradeRejectedError) -> HTTPException:
+    status_code, detail = grade_rejection_errors[error.status]
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+@router.post("/", status_code=201, responses={202: {}})
 async def create_grade(
     db_session: DBSessionDep,
     auth_token_body: Annotated[AuthJWTTokenPayload, AuthJWTTokenValidatorDep],
+    response: Response,
     body: GradeSchema = Body(...),
 ):
+    if app_config.GRADE_BUFFER_ENABLED:
+        try:
+            new_grade = await grade_buffer.submit(
+                body, auth_token_body["user_id"]
+            )
+        except GradeRejectedError as error:
+            raise grade_rejected(error)
+        # The buffer counts the vote in the live results once it is stored
+        if app_config.GRADE_BUFFER_ACK == "queued":
+            # Accepted, but not stored yet
+            response.status_code = 202
+        return new_grade
 
-    new_grade = await GradeService.add_grade(
-        db_session, body, auth_token_body["user_id"]
+    try:
+        new_grade = await GradeService.add_grade(
+            db_session, body, auth_token_body["user_id"]
+        )
+    except GradeRejectedError as error:
+        raise grade_rejected(error)
+    live_results.record_votes(
+        [(new_grade.survey_id, new_grade.grade, new_grade.created_at)]
     )
     return new_grade
+
+
+@router.post(
+    "/bulk",
+    status_code=200,
+    response_model=GradeBulkResultSchema,
+    responses={401: {}, 403: {}, 413: {}},
+)
+async def create_grades(
+    db_session: DBSessionDep,
+    auth_token_body: Annotated[AuthJWTTokenPayload, AuthJWTTokenValidatorDep],
+    body: GradeBulkSchema = Body(...),
+):
+    """Stores a batch of grades at once, e.g. votes synced by a kiosk.
+    Grades of other users can be stored only by an admin."""
+    if len(body.grades) > app_config.GRADES_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {app_config.GRADES_BULK_MAX_ITEMS} grades "
+            "can be stored at once",
+        )
+
+    user_id = auth_token_body["user_id"]
+    if not auth_token_body["is_admin"] and any(
+        grade.user_id not in (None, user_id) for grade in body.grades
+    ):
+        raise HTTPException(403, "No admin access")
+
+    results = await GradeService.add_grades(db_session, body.grades, user_id)
+    live_results.record_votes(
+        (
+            body.grades[result["index"]].survey_id,
+            body.grades[result["index"]].grade,
+            None,
+        )
+        for result in results
+        if result["status"] == "created"
+    )
+    return {
+        "created": sum(result["status"] == "created" for result in results),
+        "results": results,
+    }
@@ -1,22 +1,24 @@
-import io
-import os
-import shutil
-import uuid
-from datetime import datetime, timedelta
 from typing import Annotated, Sequence
 
-import matplotlib.dates as mdates
-import matplotlib.pyplot as plt
-from fastapi import APIRouter, BackgroundTasks, Body, HTTPException
-from fastapi.responses import FileResponse
-from matplotlib.dates import date2num
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 
 import services.grades as GradeService
 import services.surveys as SurveyService
-from config import DBSessionDep, hash_helper
+import services.tallies as TallyService
+from config import DBSessionDep, app_config, hash_helper
 from models.surveys import Survey
+from routes import (
+    CacheControlDep,
+    CursorPaginationParamsDep,
+    json_response,
+    ndjson_export_response,
+)
+from schemas import CursorPaginatedSchema
+from schemas.grades import SurveyResultsSchema, SurveyStatsSchema
+from schemas.pagination import CursorPaginationParamsSchema
+from schemas.reports import ReportJobSchema
 from schemas.surveys import SurveyPlusSchema, SurveySchema
 from services.auth import (
     AdminAccessCheckDep,
@@ -24,9 +26,15 @@ from services.auth import (
     AuthJWTTokenValidatorDep,
     construct_auth_jwt,
 )
+from services.live_results import live_results
+from services.reports import ReportJob, report_jobs
 
 router = APIRouter()
 
+# Serializers of the list responses, built once, see json_response
+survey_list_serializer = TypeAdapter(Sequence[SurveyPlusSchema])
+survey_page_serializer = TypeAdapter(CursorPaginatedSchema[SurveyPlusSchema])
+
 
 @router.post("/", status_code=201, response_model=SurveyPlusSchema)
 async def create_survey(
@@ -49,28 +57,33 @@ async def get_current_surveys(
     db_session: DBSessionDep,
     auth_token_body: Annotated[AuthJWTTokenPayload, AuthJWTTokenValidatorDep],
 ):
-    # Pobierz wszystkie ankiety, ustawiając pustą listę jako domyślną wartość
-    all_surveys = await SurveyService.get_all_survey(db_session) or []
-
-    # Filtruj ankiety, które są aktualnie otwarte
-    now = datetime.now()
-    current_surveys = [
-        survey
-        for survey in all_surveys
-        if (
-            (survey.start_at <= now <= survey.finishes_at)
-            and not (
-                await GradeService.get_grade_for_survey(
-                    db_session, auth_token_body["user_id"], survey.id
-                )
-            )
-        )
-    ]
+    current_surveys = await SurveyService.get_current_surveys_for_user(
+        db_session, auth_token_body["user_id"]
+    )
+
+    return json_response(survey_list_serializer, current_surveys)
+
 
-    return current_surveys
+@router.get(
+    "/export",
+    status_code=200,
+    responses={401: {}},
+    dependencies=[AdminAccessCheckDep],
+)
+async def export_surveys():
+    return ndjson_export_response(
+        SurveyService.stream_surveys, SurveyPlusSchema
+    )
 
 
-@router.get("/{id}", status_code=200, response_model=SurveyPlusSchema)
+@router.get(
+    "/{id}",
+    status_code=200,
+    response_model=SurveyPlusSchema,
+    responses={304: {}},
+    # Surveys are never modified after they are created
+    dependencies=[CacheControlDep("private, max-age=300")],
+)
 async def get_survey(
     db_session: DBSessionDep,
     id,
@@ -81,136 +94,173 @@ async def get_survey(
     return survey
 
 
-@router.get("/", status_code=200, response_model=Sequence[SurveyPlusSchema])
+@router.get(
+    "/",
+    status_code=200,
+    response_model=CursorPaginatedSchema[SurveyPlusSchema],
+    responses={304: {}},
+    dependencies=[CacheControlDep("private, no-cache")],
+)
 async def get_all_surveys(
     db_session: DBSessionDep,
     auth_token_body: Annotated[AuthJWTTokenPayload, AdminAccessCheckDep],
-) -> list:
-
-    survey_list = await SurveyService.get_all_survey(db_session)
-    return survey_list
-
+    pagination: Annotated[
+        CursorPaginationParamsSchema, Depends(CursorPaginationParamsDep)
+    ],
+    response: Response,
+):
 
-def cleanup_temp_report_directory(path: str):
-    shutil.rmtree(path)
+    surveys_page = await SurveyService.get_surveys_page(db_session, pagination)
+    return json_response(survey_page_serializer, surveys_page, response)
 
 
 @router.get(
-    "/{id}/report",
+    "/{id}/stats",
     status_code=200,
+    response_model=SurveyStatsSchema,
     responses={401: {}},
+    dependencies=[AdminAccessCheckDep],
 )
-async def get_report(
-    id,
+async def get_survey_stats(
+    id: int,
     db_session: DBSessionDep,
-    auth_token_body: Annotated[AuthJWTTokenPayload, AdminAccessCheckDep],
-    background_tasks: BackgroundTasks,
+    buckets: int = Query(
+        ge=1, le=1000, default=app_config.REPORT_HISTOGRAM_BINS
+    ),
 ):
+    """Vote count, mean, min/max, per-grade and per-time-bucket counts"""
     survey: Survey | None = await SurveyService.get_survey(db_session, id)
     if not survey:
         raise HTTPException(status_code=404, detail="No survey found")
 
-    grades_data = await GradeService.get_grades_by_survey(db_session, id)
-
-    # Create a unique folder for storing temporary files
-    report_id = uuid.uuid4()
-    temp_dir = f"reports/{report_id}"
-    os.makedirs(temp_dir, exist_ok=True)
-
-    # File paths within the unique folder
-    hist_filename = os.path.join(temp_dir, "histogram.png")
-    pdf_path = os.path.join(temp_dir, "report.pdf")
-
-    # Extract grades and created_at timestamps for analysis
-    grades = [entry.grade for entry in grades_data]
-    timestamps = [entry.created_at for entry in grades_data]
-
-    # 1. Create a histogram
-
-    # Parse start and end times for the survey
-    started_at = survey.start_at
-    closes_at = survey.finishes_at
-
-    # Calculate total time span and 5% intervals
-    total_duration = closes_at - started_at
-    interval_duration = timedelta(seconds=total_duration.total_seconds() / 20)
-    # Each bin represents 5% of the total time
-
-    # Create time bins (20 bins, each 5% of total time)
-    time_bins = [started_at + i * interval_duration for i in range(21)]
-    time_bins_numeric = date2num(time_bins)
-
-    # Extract vote timestamps for histogram calculation
-    grade_times = [entry.created_at for entry in grades_data]
-
-    # Count the number of votes in each time bin
-    grade_counts = []
-    for i in range(len(time_bins) - 1):
-        start = time_bins[i]
-        end = time_bins[i + 1]
-        count = sum(start <= grade_time < end for grade_time in grade_times)
-        grade_counts.append(count)
-
-    # 1. Plot Histogram
-    plt.figure(figsize=(10, 6))
-    plt.bar(time_bins[:-1], grade_counts, width=interval_duration, align="edge", color="skyblue")  # type: ignore
-    plt.xlabel("Time")
-    plt.ylabel("Number of grades")
-    plt.title("Distribution of grades over time")
-
-    # Format x-axis as dates
-    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
-    plt.gca().xaxis.set_major_locator(mdates.HourLocator(interval=1))
-    plt.xticks(rotation=45)
-
-    # Display each bin's start time on the x-axis
-    bin_labels = [bin_start.strftime("%H:%M") for bin_start in time_bins]
-    plt.xticks(
-        time_bins_numeric, bin_labels, rotation=45, ha="right", fontsize=8
-    )  # type:ignore
-
-    # Save the histogram image to the temporary folder
-    plt.savefig(hist_filename, format="png")
-    plt.close()
-
-    # 2. Generate PDF report
-    c = canvas.Canvas(pdf_path, pagesize=letter)
-
-    # Title
-    c.drawString(100, 750, f"Report: results for the '{survey.title}' survey")
-    c.drawString(100, 730, f"Average grade {sum(grades)/len(grades)}")
-
-    # Include histogram
-    c.drawImage(
-        hist_filename, 100, 420, width=400, height=300
-    )  # Adjust position and size as needed
-
-    # 3. Add summary of voting results (count of each grade)
-    grade_counts = {grade: grades.count(grade) for grade in set(grades)}
-    summary_y_position = 400
-    c.drawString(100, summary_y_position, "Summary of grades:")
-    for grade, count in grade_counts.items():
-        summary_y_position -= 20
-        c.drawString(120, summary_y_position, f"Grade {grade}: {count} votes")
-
-    # 4. List each vote with timestamp and user_id
-    list_y_position = summary_y_position - 40
-    c.drawString(100, list_y_position, "Detailed list of grade:")
-    for entry in grades_data:
-        list_y_position -= 20
-        c.drawString(
-            120,
-            list_y_position,
-            f"User gave a grade of {entry.grade} on {entry.created_at}",
-        )
+    return await GradeService.get_survey_stats(db_session, survey, buckets)
+
+
+@router.get(
+    "/{id}/results",
+    status_code=200,
+    response_model=SurveyResultsSchema,
+    responses={401: {}},
+    dependencies=[AdminAccessCheckDep],
+)
+async def get_survey_results(id: int, db_session: DBSessionDep):
+    """Vote count, sum, mean, per-grade and per-time-bucket counts read
+    from the incrementally maintained tallies"""
+    survey: Survey | None = await SurveyService.get_survey(db_session, id)
+    if not survey:
+        raise HTTPException(status_code=404, detail="No survey found")
 
-    # Finalize and save the PDF
-    c.showPage()
-    c.save()
+    return await TallyService.get_survey_results(db_session, id)
 
-    # Schedule cleanup of the temporary folder after response is sent
-    background_tasks.add_task(cleanup_temp_report_directory, temp_dir)
 
-    return FileResponse(
-        pdf_path, media_type="application/pdf", filename="report.pdf"
+@router.get(
+    "/{id}/live",
+    status_code=200,
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}, 401: {}},
+    dependencies=[AdminAccessCheckDep],
+)
+async def get_survey_live_results(id: int, db_session: DBSessionDep):
+    """Server-sent "results" events, shaped like GET /surveys/{id}/results,
+    pushed at most once per LIVE_RESULTS_INTERVAL_MS while votes come in"""
+    survey: Survey | None = await SurveyService.get_survey(db_session, id)
+    if not survey:
+        raise HTTPException(status_code=404, detail="No survey found")
+
+    return StreamingResponse(
+        live_results.subscribe(id),
+        media_type="text/event-stream",
+        # Keep reverse proxies from buffering the events
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+def report_job_response(job: ReportJob) -> ReportJobSchema:
+    return ReportJobSchema(
+        job_id=job.id,
+        survey_id=job.survey_id,
+        status=job.status,
+        error=job.error,
+    )
+
+
+def report_pdf_response(pdf: bytes) -> Response:
+    return Response(
+        pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": 'attachment; filename="report.pdf"'},
+    )
+
+
+async def submit_report_job(db_session: DBSessionDep, id: int) -> ReportJob:
+    survey: Survey | None = await SurveyService.get_survey(db_session, id)
+    if not survey:
+        raise HTTPException(status_code=404, detail="No survey found")
+
+    return await report_jobs.submit(db_session, survey.id)
+
+
+async def get_report_job(id: int, job_id: str) -> ReportJob:
+    job = report_jobs.get_job(id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No report job found")
+    return job
+
+
+@router.post(
+    "/{id}/report",
+    status_code=202,
+    response_model=ReportJobSchema,
+    responses={401: {}},
+    dependencies=[AdminAccessCheckDep],
+)
+async def create_report_job(
+    job: Annotated[ReportJob, Depends(submit_report_job)],
+):
+    """Starts rendering the report in the background, poll the returned job"""
+    return report_job_response(job)
+
+
+@router.get(
+    "/{id}/report/{job_id}",
+    status_code=200,
+    response_model=ReportJobSchema,
+    responses={401: {}},
+    dependencies=[AdminAccessCheckDep],
+)
+async def get_report_job_status(
+    job: Annotated[ReportJob, Depends(get_report_job)],
+):
+    return report_job_response(job)
+
+
+@router.get(
+    "/{id}/report/{job_id}/download",
+    status_code=200,
+    responses={401: {}},
+    dependencies=[AdminAccessCheckDep],
+)
+async def download_report(
+    job: Annotated[ReportJob, Depends(get_report_job)],
+):
+    if job.pdf is None:
+        raise HTTPException(
+            status_code=409, detail=f"Report job is {job.status}"
+        )
+    return report_pdf_response(job.pdf)
+
+
+@router.get(
+    "/{id}/report",
+    status_code=200,
+    responses={401: {}},
+    dependencies=[AdminAccessCheckDep],
+)
+async def get_report(
+    job: Annotated[ReportJob, Depends(submit_report_job)],
+):
+    """Renders the report (or takes it from cache) and waits for the PDF"""
+    await job.wait()
+    if job.pdf is None:
+        raise HTTPException(status_code=500, detail="Report generation failed")
+    return report_pdf_response(job.pdf)
@@ -1,15 +1,25 @@
 from typing import Annotated, Sequence
 
-from fastapi import APIRouter, Body, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException
+from pydantic import TypeAdapter
 
 import services.user as UserService
 from config import DBSessionDep, hash_helper
 from models.user import User
+from routes import (
+    CacheControlDep,
+    CursorPaginationParamsDep,
+    json_response,
+    ndjson_export_response,
+)
+from schemas import CursorPaginatedSchema
+from schemas.pagination import CursorPaginationParamsSchema
 from schemas.user import (
     UserLoginCredentialsSchema,
     UserLoginResponseSchema,
     UserModSchema,
     UserPlusSchema,
+    UserRefreshTokenSchema,
     UserSchema,
     UserSignUpSchema,
 )
@@ -18,10 +28,16 @@ from services.auth import (
     AuthJWTTokenPayload,
     AuthJWTTokenValidatorDep,
     construct_auth_jwt,
+    decode_refresh_jwt,
+    user_token_versions,
 )
+from services.passwords import password_hasher
 
 router = APIRouter()
 
+# Serializer of the list response, built once, see json_response
+user_page_serializer = TypeAdapter(CursorPaginatedSchema[UserPlusSchema])
+
 
 @router.post("/login", status_code=200, response_model=UserLoginResponseSchema)
 async def login(
@@ -33,7 +49,7 @@ async def login(
     )
 
     if existing_user:
-        password_valid: bool = hash_helper.verify(
+        password_valid: bool = await password_hasher.verify(
             user_credentials.password, existing_user.password_hash
         )
 
@@ -49,6 +65,31 @@ async def login(
     )
 
 
+@router.post(
+    "/refresh", status_code=200, response_model=UserLoginResponseSchema
+)
+async def refresh_token(
+    db_session: DBSessionDep,
+    body: UserRefreshTokenSchema = Body(...),
+):
+    """Issues a new token pair with the user's current permissions"""
+    refresh_token_body = decode_refresh_jwt(body.refresh_token)
+    if refresh_token_body is None:
+        raise HTTPException(
+            status_code=401, detail="Invalid token or expired token"
+        )
+
+    user: User | None = await UserService.get_user(
+        db_session, refresh_token_body["user_id"]
+    )
+    if (
+        user is None
+        or user.token_version != refresh_token_body["token_version"]
+    ):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return construct_auth_jwt(user)
+
+
 @router.post(
     "/",
     status_code=201,
@@ -69,15 +110,15 @@ async def create_user(
             detail="User with the provided username already exists",
         )
 
-    new_user = await UserService.create_user(db_session, body)
-    return new_user
+    return await UserService.create_user(db_session, body)
 
 
 @router.get(
     "/current",
     status_code=200,
     response_model=UserPlusSchema,
-    responses={401: {}},
+    responses={304: {}, 401: {}},
+    dependencies=[CacheControlDep("private, no-cache")],
 )
 async def get_current_user(
     auth_token_body: Annotated[AuthJWTTokenPayload, AuthJWTTokenValidatorDep],
@@ -94,22 +135,37 @@ async def get_current_user(
 @router.get(
     "/all",
     status_code=200,
-    response_model=Sequence[UserPlusSchema],
+    response_model=CursorPaginatedSchema[UserPlusSchema],
     responses={401: {}},
     dependencies=[AdminAccessCheckDep],
 )
 async def get_all_users(
     db_session: DBSessionDep,
+    pagination: Annotated[
+        CursorPaginationParamsSchema, Depends(CursorPaginationParamsDep)
+    ],
 ):
-    users = await UserService.get_users(db_session)
-    return users
+    users_page = await UserService.get_users_page(db_session, pagination)
+    return json_response(user_page_serializer, users_page)
+
+
+@router.get(
+    "/export",
+    status_code=200,
+    responses={401: {}},
+    dependencies=[AdminAccessCheckDep],
+)
+async def export_users():
+    """Streams all users as NDJSON without loading them into memory"""
+    return ndjson_export_response(UserService.stream_users, UserPlusSchema)
 
 
 @router.get(
     "/{id}",
     status_code=200,
     response_model=UserPlusSchema,
-    responses={401: {}},
+    responses={304: {}, 401: {}},
+    dependencies=[CacheControlDep("private, no-cache")],
 )
 async def get_user(
     id,
@@ -135,8 +191,10 @@ async def delete_user(
             detail="User does not exist",
         )
 
+    user_id = user_to_delete.id
     await db_session.delete(user_to_delete)
     await db_session.commit()
+    user_token_versions.mark_deleted(user_id)
     return
 
 
@@ -187,8 +245,18 @@ async def modify_user(
     if update_data["last_name"] is not None:
         user.last_name = update_data["last_name"]
 
-    if update_data["is_admin"] is not None:
+    revoke_tokens = False
+    if (
+        update_data["is_admin"] is not None
+        and update_data["is_admin"] != user.is_admin
+    ):
         user.is_admin = update_data["is_admin"]
+        # Tokens carry the admin flag, so the old ones must stop working
+        user.token_version += 1
+        revoke_tokens = True
 
+    user_id, token_version = user.id, user.token_version
     await db_session.commit()
+    if revoke_tokens:
+        user_token_versions.set_version(user_id, token_version)
     return
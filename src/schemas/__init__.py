@@ -1,4 +1,4 @@
-from typing import Generic, Sequence, TypeVar
+from typing import Generic, Optional, Sequence, TypeVar
 
 from pydantic import AliasGenerator, BaseModel, ConfigDict
 from pydantic.alias_generators import to_camel
@@ -22,3 +22,10 @@ class PaginatedSchema(BaseSchema, Generic[PaginatedSchemaType]):
     total_docs: int
     total_pages: int
     has_next_page: bool
+
+
+class CursorPaginatedSchema(BaseSchema, Generic[PaginatedSchemaType]):
+    docs: Sequence[PaginatedSchemaType]
+    next_cursor: Optional[int]
+    has_next_page: bool
+    total_docs: Optional[int] = None
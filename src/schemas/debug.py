@@ -0,0 +1,35 @@
+from typing import Optional, Sequence
+
+from pydantic import ConfigDict
+
+from schemas import BaseSchema
+
+
+class SlowRequestCaptureSchema(BaseSchema):
+    method: str
+    path: str
+    captured_at: float
+    elapsed_ms: float
+    duration_ms: Optional[float]
+    loop_stack: Sequence[str]
+    task_stack: Sequence[str]
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "method": "GET",
+                "path": "/surveys/1/report",
+                "capturedAt": 1730710800.0,
+                "elapsedMs": 2004.1,
+                "durationMs": 3120.5,
+                "loopStack": [
+                    "run_forever (base_events.py:593)",
+                    "_run_once (base_events.py:1845)",
+                ],
+                "taskStack": [
+                    "__call__ (profiler.py:222)",
+                    "get_report (surveys.py:215)",
+                ],
+            }
+        },
+    )
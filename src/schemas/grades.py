@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Literal, Optional, Sequence
+
 from pydantic import BaseModel, ConfigDict
 
 from schemas import BaseSchema
@@ -13,3 +16,129 @@ class GradeSchema(BaseSchema):
             "example": {"grade": 1, "survey_id": 1, "user_id": 1}
         },
     )
+
+
+class GradeBulkItemSchema(GradeSchema):
+    # Set by admins syncing votes cast by other users, e.g. from a kiosk
+    user_id: Optional[int] = None
+
+
+class GradeBulkSchema(BaseSchema):
+    grades: Sequence[GradeBulkItemSchema]
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "grades": [
+                    {"grade": 5, "surveyId": 1},
+                    {"grade": 3, "surveyId": 2, "userId": 7},
+                ]
+            }
+        },
+    )
+
+
+class GradeBulkItemResultSchema(BaseSchema):
+    index: int
+    status: Literal[
+        "created",
+        "duplicate",
+        "survey_not_found",
+        "survey_closed",
+        "user_not_found",
+    ]
+    id: Optional[int] = None
+
+
+class GradeBulkResultSchema(BaseSchema):
+    created: int
+    results: Sequence[GradeBulkItemResultSchema]
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "created": 1,
+                "results": [
+                    {"index": 0, "status": "created", "id": 12},
+                    {"index": 1, "status": "duplicate"},
+                ],
+            }
+        },
+    )
+
+
+class GradeCountSchema(BaseSchema):
+    grade: int
+    count: int
+
+
+class TimeBucketSchema(BaseSchema):
+    start_at: datetime
+    finishes_at: datetime
+    count: int
+
+
+class SurveyStatsSchema(BaseSchema):
+    survey_id: int
+    count: int
+    mean: Optional[float]
+    min: Optional[int]
+    max: Optional[int]
+    grade_counts: Sequence[GradeCountSchema]
+    time_buckets: Sequence[TimeBucketSchema]
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "surveyId": 1,
+                "count": 3,
+                "mean": 4.0,
+                "min": 3,
+                "max": 5,
+                "gradeCounts": [
+                    {"grade": 3, "count": 1},
+                    {"grade": 4, "count": 1},
+                    {"grade": 5, "count": 1},
+                ],
+                "timeBuckets": [
+                    {
+                        "startAt": "2024-11-04T08:00:00",
+                        "finishesAt": "2024-11-04T09:00:00",
+                        "count": 3,
+                    }
+                ],
+            }
+        },
+    )
+
+
+class SurveyResultsSchema(BaseSchema):
+    survey_id: int
+    count: int
+    sum: int
+    mean: Optional[float]
+    grade_counts: Sequence[GradeCountSchema]
+    time_buckets: Sequence[TimeBucketSchema]
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "surveyId": 1,
+                "count": 3,
+                "sum": 12,
+                "mean": 4.0,
+                "gradeCounts": [
+                    {"grade": 3, "count": 1},
+                    {"grade": 4, "count": 1},
+                    {"grade": 5, "count": 1},
+                ],
+                "timeBuckets": [
+                    {
+                        "startAt": "2024-11-04T08:00:00",
+                        "finishesAt": "2024-11-04T08:05:00",
+                        "count": 3,
+                    }
+                ],
+            }
+        },
+    )
@@ -1,6 +1,14 @@
+from typing import Optional
+
 from . import BaseSchema
 
 
 class PaginationParamsSchema(BaseSchema):
     page: int
     limit: int
+
+
+class CursorPaginationParamsSchema(BaseSchema):
+    after: Optional[int] = None
+    limit: int
+    with_total: bool = False
@@ -0,0 +1,22 @@
+from typing import Literal, Optional
+
+from pydantic import ConfigDict
+
+from schemas import BaseSchema
+
+
+class ReportJobSchema(BaseSchema):
+    job_id: str
+    survey_id: int
+    status: Literal["pending", "done", "failed"]
+    error: Optional[str] = None
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "jobId": "1-42",
+                "surveyId": 1,
+                "status": "pending",
+            }
+        },
+    )
@@ -16,6 +16,15 @@ class UserLoginCredentialsSchema(BaseSchema, HTTPBasicCredentials):
 
 class UserLoginResponseSchema(BaseSchema):
     access_token: str
+    refresh_token: str
+
+
+class UserRefreshTokenSchema(BaseSchema):
+    refresh_token: str
+
+    model_config = ConfigDict(
+        json_schema_extra={"example": {"refreshToken": "token"}}
+    )
 
 
 class UserSignUpSchema(BaseSchema, HTTPBasicCredentials):
@@ -0,0 +1,9 @@
+from datetime import datetime
+
+
+def get_time_bins(
+    started_at: datetime, closes_at: datetime, bins: int
+) -> list[datetime]:
+    """Edges of ``bins`` equally wide time bins spanning the survey."""
+    interval_duration = (closes_at - started_at) / bins
+    return [started_at + i * interval_duration for i in range(bins + 1)]
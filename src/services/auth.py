@@ -1,22 +1,40 @@
+import asyncio
+import hashlib
+import hmac
+import logging
 import time
-from typing import Annotated, Dict, TypedDict
+from collections import OrderedDict
+from typing import Annotated, Dict, Tuple, TypedDict
 
 import jwt
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from config import app_config
+from config import app_config, session_manager
 from models.user import User
 
+logger = logging.getLogger(__name__)
+
 
 class AuthJWTTokenPayload(TypedDict):
     user_id: int
     expires_at: float
     is_admin: bool
+    token_version: int
+    token_type: str
+
 
+class AuthRefreshTokenPayload(TypedDict):
+    user_id: int
+    expires_at: float
+    token_version: int
+    token_type: str
 
-def construct_token_json_response(token: str):
-    return {"access_token": token}
+
+def construct_token_json_response(token: str, refresh_token: str):
+    return {"access_token": token, "refresh_token": refresh_token}
 
 
 secret_key = app_config.JWT_SECRET_KEY
@@ -26,14 +44,26 @@ def construct_auth_jwt(user: User) -> Dict[str, str]:
     # Set the expiry time.
     payload: AuthJWTTokenPayload = {
         "user_id": user.id,
-        "expires_at": time.time() + 2400,
+        "expires_at": time.time() + app_config.JWT_ACCESS_EXPIRES_SECONDS,
         "is_admin": user.is_admin,
+        "token_version": user.token_version,
+        "token_type": "access",
+    }
+    refresh_payload: AuthRefreshTokenPayload = {
+        "user_id": user.id,
+        "expires_at": time.time() + app_config.JWT_REFRESH_EXPIRES_SECONDS,
+        "token_version": user.token_version,
+        "token_type": "refresh",
     }
     return construct_token_json_response(
-        jwt.encode(payload, secret_key, algorithm="HS256")  # type: ignore
+        encode_jwt(payload), encode_jwt(refresh_payload)
     )
 
 
+def encode_jwt(payload: AuthJWTTokenPayload | AuthRefreshTokenPayload) -> str:
+    return jwt.encode(payload, secret_key, algorithm="HS256")  # type: ignore
+
+
 def decode_jwt(token: str) -> AuthJWTTokenPayload | None:
     decoded_token: AuthJWTTokenPayload = jwt.decode(
         token.encode(), secret_key, algorithms=["HS256"]
@@ -43,6 +73,178 @@ def decode_jwt(token: str) -> AuthJWTTokenPayload | None:
     )
 
 
+def decode_refresh_jwt(token: str) -> AuthRefreshTokenPayload | None:
+    try:
+        decoded_token = decode_jwt(token)
+    except jwt.PyJWTError:
+        return None
+    if decoded_token is None or decoded_token.get("token_type") != "refresh":
+        return None
+    return decoded_token  # type: ignore
+
+
+# Marks users deleted since the last sync, any token version is rejected
+DELETED_USER = -1
+
+
+class UserTokenVersionsStats(TypedDict):
+    users: int
+    max_user_id: int
+    last_synced_at: float | None
+    rejected: int
+
+
+class UserTokenVersions:
+    """In-process copy of the users' token versions.
+
+    A token is revoked when it carries an older version than the user's
+    current one or when the user no longer exists, so the check is a dict
+    lookup instead of a query per request. The map is reloaded from the DB
+    every TOKEN_REVOCATION_SYNC_SECONDS, changes made by this worker are
+    applied right away.
+    """
+
+    def __init__(self):
+        self._versions: Dict[int, int] = {}
+        # Users above this id were created after the last sync
+        self._max_user_id = 0
+        # Changes made by this worker with the time they were made, so that
+        # a sync that read the DB before they were committed keeps them
+        self._local_changes: Dict[int, Tuple[int, float]] = {}
+        self.last_synced_at: float | None = None
+        self.rejected = 0
+
+    def is_revoked(self, user_id: int, token_version: int) -> bool:
+        current = self._versions.get(user_id)
+        if current is None:
+            revoked = user_id <= self._max_user_id
+        else:
+            revoked = current == DELETED_USER or token_version < current
+        if revoked:
+            self.rejected += 1
+        return revoked
+
+    def set_version(self, user_id: int, token_version: int):
+        # User ids are never reused, a deleted user stays revoked
+        if self._versions.get(user_id) == DELETED_USER:
+            return
+        self._versions[user_id] = token_version
+        self._local_changes[user_id] = (token_version, time.monotonic())
+
+    def mark_deleted(self, user_id: int):
+        self.set_version(user_id, DELETED_USER)
+
+    async def sync(self, db_session: AsyncSession):
+        started_at = time.monotonic()
+        result = await db_session.execute(select(User.id, User.token_version))
+        versions: Dict[int, int] = dict(result.tuples().all())
+        # Kept growing, deleting the newest user must not make its id unknown
+        max_user_id = max(max(versions, default=0), self._max_user_id)
+
+        for user_id, (token_version, changed_at) in list(
+            self._local_changes.items()
+        ):
+            if changed_at < started_at:
+                del self._local_changes[user_id]
+            else:
+                versions[user_id] = token_version
+                max_user_id = max(max_user_id, user_id)
+
+        self._versions = versions
+        self._max_user_id = max_user_id
+        self.last_synced_at = time.time()
+
+    async def keep_in_sync(self, interval: float):
+        while True:
+            try:
+                async with session_manager.session() as db_session:
+                    await self.sync(db_session)
+            except Exception:
+                logger.exception("Failed to sync user token versions")
+            await asyncio.sleep(interval)
+
+    def stats(self) -> UserTokenVersionsStats:
+        return {
+            "users": len(self._versions),
+            "max_user_id": self._max_user_id,
+            "last_synced_at": self.last_synced_at,
+            "rejected": self.rejected,
+        }
+
+
+user_token_versions = UserTokenVersions()
+
+
+class VerifiedTokenCacheStats(TypedDict):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+
+
+class VerifiedTokenCache:
+    """LRU cache of token payloads whose signature was already verified.
+
+    Entries are keyed by a digest of the token, so the tokens themselves are
+    not kept in memory, and are dropped once the token expires.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._payloads: OrderedDict[bytes, AuthJWTTokenPayload] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> AuthJWTTokenPayload | None:
+        key = hashlib.sha256(token.encode()).digest()
+        payload = self._payloads.get(key)
+        if payload is None:
+            self.misses += 1
+            return None
+
+        if payload["expires_at"] < time.time():
+            del self._payloads[key]
+            self.misses += 1
+            return None
+
+        self._payloads.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, token: str, payload: AuthJWTTokenPayload):
+        if self._max_size <= 0:
+            return
+        key = hashlib.sha256(token.encode()).digest()
+        self._payloads[key] = payload
+        self._payloads.move_to_end(key)
+        while len(self._payloads) > self._max_size:
+            self._payloads.popitem(last=False)
+
+    def clear(self):
+        self._payloads.clear()
+
+    def stats(self) -> VerifiedTokenCacheStats:
+        return {
+            "size": len(self._payloads),
+            "max_size": self._max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+verified_token_cache = VerifiedTokenCache(app_config.JWT_CACHE_SIZE)
+
+
+def decode_jwt_cached(token: str) -> AuthJWTTokenPayload | None:
+    """``decode_jwt`` that skips signature verification for known tokens"""
+    payload = verified_token_cache.get(token)
+    if payload is None:
+        payload = decode_jwt(token)
+        if payload is not None:
+            verified_token_cache.put(token, payload)
+    return payload
+
+
 class JWTBearer(HTTPBearer):
     async def __call__(self, request: Request) -> AuthJWTTokenPayload:  # type: ignore
         authorization: HTTPAuthorizationCredentials = await super(  # type: ignore
@@ -58,12 +260,23 @@ class JWTBearer(HTTPBearer):
                     detail="Invalid authentication token type. Must be Bearer",
                 )
 
-            decoded_token = decode_jwt(authorization.credentials)
+            decoded_token = decode_jwt_cached(authorization.credentials)
 
-            if not decoded_token:
+            if (
+                not decoded_token
+                or decoded_token.get("token_type", "access") != "access"
+            ):
                 raise HTTPException(
                     status_code=401, detail="Invalid token or expired token"
                 )
+
+            # Checked on every request, cached payloads included
+            if user_token_versions.is_revoked(
+                decoded_token["user_id"], decoded_token.get("token_version", 0)
+            ):
+                raise HTTPException(
+                    status_code=401, detail="Token has been revoked"
+                )
             return decoded_token  # type: ignore
         else:
             raise HTTPException(
@@ -74,7 +287,8 @@ class JWTBearer(HTTPBearer):
 AuthJWTTokenValidatorDep = Depends(JWTBearer())
 
 
-def check_admin_access(
+# Declared async, FastAPI would run a sync dependency in the threadpool
+async def check_admin_access(
     token_data: Annotated[AuthJWTTokenPayload, AuthJWTTokenValidatorDep],
 ) -> AuthJWTTokenPayload:
     if token_data["is_admin"]:
@@ -83,3 +297,19 @@ def check_admin_access(
 
 
 AdminAccessCheckDep = Depends(check_admin_access)
+
+
+async def check_metrics_token(
+    authorization: Annotated[
+        HTTPAuthorizationCredentials, Depends(HTTPBearer())
+    ],
+) -> None:
+    # Compared in constant time, unlike JWTs the token does not expire
+    if not hmac.compare_digest(
+        authorization.credentials.encode(),
+        str(app_config.METRICS_TOKEN).encode(),
+    ):
+        raise HTTPException(401, "Invalid metrics token")
+
+
+MetricsAccessCheckDep = Depends(check_metrics_token)
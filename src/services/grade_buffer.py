@@ -0,0 +1,273 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, TypedDict
+
+from sqlalchemy import select
+
+from config import app_config, session_manager
+from metrics import create_background_task
+from models.grades import Grade
+from models.surveys import Survey
+from schemas.grades import GradeSchema
+from services.grades import (
+    GradeRejectedError,
+    insert_grades_skipping_duplicates,
+)
+from services.live_results import live_results
+from services.tallies import add_to_tallies
+
+logger = logging.getLogger(__name__)
+
+
+class GradeBufferStats(TypedDict):
+    ack: str
+    queued: int
+    indexed_surveys: int
+    flushed_batches: int
+    flushed_grades: int
+    duplicates: int
+    failed_grades: int
+
+
+class PendingGrade:
+    def __init__(self, values: dict[str, Any], future: asyncio.Future | None):
+        self.values = values
+        self.future = future
+
+
+class GradeWriteBuffer:
+    """Write-behind queue for ``POST /grades/``.
+
+    Votes are checked against an in-memory index of survey windows and of
+    the users who already graded each open survey, then queued and stored
+    by a background task in a single INSERT per micro-batch, flushed every
+    ``flush_interval_ms`` or as soon as ``max_batch`` votes are queued.
+
+    With the "committed" acknowledgement a request waits for the commit of
+    its batch. With "queued" it returns right after the in-memory checks,
+    so votes still in the queue are lost if the process dies.
+    """
+
+    def __init__(
+        self,
+        flush_interval_ms: int = 50,
+        max_batch: int = 500,
+        ack: str = "committed",
+    ):
+        self._flush_interval = flush_interval_ms / 1000
+        self._max_batch = max_batch
+        self._ack = ack
+        self._pending: list[PendingGrade] = []
+        self._windows: dict[int, tuple[datetime, datetime]] = {}
+        # Users who graded a survey, kept only while the survey is open
+        self._graded: dict[int, set[int]] = {}
+        self._loading: dict[int, asyncio.Future] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self._flushed_batches = 0
+        self._flushed_grades = 0
+        self._duplicates = 0
+        self._failed_grades = 0
+
+    async def _load_survey(
+        self, survey_id: int, now: datetime
+    ) -> tuple[tuple[datetime, datetime], set[int]] | None:
+        # A session of its own, so that no request holds a connection while
+        # waiting for its batch to be flushed
+        async with session_manager.session() as db_session:
+            window = (
+                await db_session.execute(
+                    select(Survey.start_at, Survey.finishes_at).where(
+                        Survey.id == survey_id
+                    )
+                )
+            ).first()
+            if window is None:
+                return None
+
+            user_ids: set[int] = set()
+            if now <= window.finishes_at:
+                user_ids.update(
+                    (
+                        await db_session.scalars(
+                            select(Grade.user_id).where(
+                                Grade.survey_id == survey_id
+                            )
+                        )
+                    ).all()
+                )
+        return (window.start_at, window.finishes_at), user_ids
+
+    async def _get_graded_users(
+        self, survey_id: int, now: datetime
+    ) -> set[int]:
+        if survey_id not in self._windows:
+            # Votes arriving while the survey is loaded share the query
+            loading = self._loading.get(survey_id)
+            if loading is None:
+                loading = create_background_task(
+                    self._load_survey(survey_id, now)
+                )
+                self._loading[survey_id] = loading
+                loading.add_done_callback(
+                    lambda _: self._loading.pop(survey_id, None)
+                )
+            loaded = await asyncio.shield(loading)
+            if loaded is None:
+                raise GradeRejectedError("survey_not_found")
+            if survey_id not in self._windows:
+                self._windows[survey_id], self._graded[survey_id] = loaded
+
+        start_at, finishes_at = self._windows[survey_id]
+        if now > finishes_at:
+            # Closed for good, no vote will be checked against its users
+            self._graded.pop(survey_id, None)
+            raise GradeRejectedError("survey_closed")
+        if now < start_at:
+            raise GradeRejectedError("survey_closed")
+        return self._graded[survey_id]
+
+    def _start(self):
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = create_background_task(self._run())
+
+    async def submit(
+        self, grade_data: GradeSchema, user_id: int
+    ) -> dict[str, Any]:
+        graded_users = await self._get_graded_users(
+            grade_data.survey_id, datetime.now()
+        )
+        if user_id in graded_users:
+            raise GradeRejectedError("duplicate")
+        graded_users.add(user_id)
+
+        if self._task is None:
+            self._start()
+
+        values = {
+            "grade": grade_data.grade,
+            "survey_id": grade_data.survey_id,
+            "user_id": user_id,
+        }
+        future = None
+        if self._ack == "committed":
+            future = asyncio.get_running_loop().create_future()
+        self._pending.append(PendingGrade(values, future))
+        if len(self._pending) >= self._max_batch:
+            self._wakeup.set()
+
+        if future is None:
+            return values
+        return await future
+
+    @staticmethod
+    def _is_awaited(pending: PendingGrade) -> bool:
+        # The future is cancelled when the client disconnects
+        return pending.future is not None and not pending.future.done()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), self._flush_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+        # Drain whatever was queued while stopping
+        await self.flush()
+
+    async def flush(self):
+        while self._pending:
+            batch = self._pending[: self._max_batch]
+            del self._pending[: self._max_batch]
+            try:
+                await self._flush_batch(batch)
+            except Exception as error:
+                logger.exception("Failed to store %d grades", len(batch))
+                self._failed_grades += len(batch)
+                for pending in batch:
+                    graded_users = self._graded.get(
+                        pending.values["survey_id"]
+                    )
+                    if graded_users is not None:
+                        graded_users.discard(pending.values["user_id"])
+                    if self._is_awaited(pending):
+                        pending.future.set_exception(error)
+
+    async def _flush_batch(self, batch: list[PendingGrade]):
+        async with session_manager.session() as db_session:
+            rows = (
+                await db_session.execute(
+                    insert_grades_skipping_duplicates(
+                        db_session.bind.dialect.name
+                    ),
+                    [pending.values for pending in batch],
+                )
+            ).all()
+            await add_to_tallies(
+                db_session,
+                ((row.survey_id, row.grade, row.created_at) for row in rows),
+            )
+            await db_session.commit()
+        # Also for queued votes, whose requests returned before the commit
+        live_results.record_votes(
+            (row.survey_id, row.grade, row.created_at) for row in rows
+        )
+
+        self._flushed_batches += 1
+        # Votes stored by another worker in the meantime were skipped
+        stored = {(row.survey_id, row.user_id): row for row in rows}
+        for pending in batch:
+            row = stored.get(
+                (pending.values["survey_id"], pending.values["user_id"])
+            )
+            if row is None:
+                self._duplicates += 1
+                if self._is_awaited(pending):
+                    pending.future.set_exception(
+                        GradeRejectedError("duplicate")
+                    )
+                continue
+
+            self._flushed_grades += 1
+            if self._is_awaited(pending):
+                pending.future.set_result(
+                    {
+                        **pending.values,
+                        "id": row.id,
+                        "created_at": row.created_at,
+                    }
+                )
+
+    def stats(self) -> GradeBufferStats:
+        return {
+            "ack": self._ack,
+            "queued": len(self._pending),
+            "indexed_surveys": len(self._graded),
+            "flushed_batches": self._flushed_batches,
+            "flushed_grades": self._flushed_grades,
+            "duplicates": self._duplicates,
+            "failed_grades": self._failed_grades,
+        }
+
+    async def shutdown(self):
+        """Stops the flush loop once the queue is drained."""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        self._windows.clear()
+        self._graded.clear()
+
+
+grade_buffer = GradeWriteBuffer(
+    app_config.GRADE_BUFFER_FLUSH_MS,
+    app_config.GRADE_BUFFER_MAX_BATCH,
+    app_config.GRADE_BUFFER_ACK,
+)
@@ -1,10 +1,76 @@
-from typing import Sequence
+from datetime import datetime
+from typing import Any, AsyncIterator, Literal, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import (
+    ColumnElement,
+    Integer,
+    case,
+    cast,
+    func,
+    literal,
+    null,
+    select,
+    tuple_,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models.grades import Grade
-from schemas.grades import GradeSchema
+from models.surveys import Survey
+from models.user import User
+from schemas.grades import GradeBulkItemSchema, GradeSchema
+from services.aggregation import get_time_bins
+from services.pagination import stream_entities
+from services.tallies import add_to_tallies, get_dialect_insert
+
+
+class GradeRejectedError(Exception):
+    def __init__(
+        self, status: Literal["survey_not_found", "survey_closed", "duplicate"]
+    ):
+        super().__init__(status)
+        self.status = status
+
+
+def insert_grade_if_open(
+    dialect_name: str, grade: int, survey_id: int, user_id: int, now: datetime
+):
+    """INSERT ... SELECT that stores the grade only while the survey is
+    open and does nothing when the user has already graded it"""
+    return (
+        get_dialect_insert(dialect_name)(Grade)
+        .from_select(
+            [Grade.grade, Grade.survey_id, Grade.user_id],
+            select(literal(grade), Survey.id, literal(user_id)).where(
+                (Survey.id == survey_id)
+                & (Survey.start_at <= now)
+                & (Survey.finishes_at >= now)
+            ),
+        )
+        .on_conflict_do_nothing(
+            index_elements=[Grade.survey_id, Grade.user_id]
+        )
+        .returning(Grade)
+    )
+
+
+def insert_grades_skipping_duplicates(dialect_name: str):
+    """Multi-row INSERT that skips the grades of users who have already
+    graded the survey, e.g. stored by a concurrent request. The stored rows
+    are returned in no particular order, match them by (survey_id, user_id)
+    """
+    return (
+        get_dialect_insert(dialect_name)(Grade)
+        .on_conflict_do_nothing(
+            index_elements=[Grade.survey_id, Grade.user_id]
+        )
+        .returning(
+            Grade.id,
+            Grade.grade,
+            Grade.survey_id,
+            Grade.user_id,
+            Grade.created_at,
+        )
+    )
 
 
 async def add_grade(
@@ -12,22 +78,161 @@ async def add_grade(
     grade_data: GradeSchema,
     user_id: int,
     commit_and_refresh: bool = True,
+    now: datetime | None = None,
 ) -> Grade:
+    """Stores the grade in a single statement, raises GradeRejectedError
+    if the survey does not exist, is not open or was already graded"""
+    if now is None:
+        now = datetime.now()
 
-    new_grade = Grade()
-    new_grade.grade = grade_data.grade
-    new_grade.survey_id = grade_data.survey_id
-    new_grade.user_id = user_id
+    new_grade: Grade | None = (
+        await db_session.scalars(
+            insert_grade_if_open(
+                db_session.bind.dialect.name,
+                grade_data.grade,
+                grade_data.survey_id,
+                user_id,
+                now,
+            )
+        )
+    ).first()
+
+    if new_grade is None:
+        if commit_and_refresh:
+            # The INSERT took the write lock, release it before the query.
+            # Otherwise the transaction is the caller's to end
+            await db_session.rollback()
+        # Only rejected votes pay for the query telling why
+        survey_window = (
+            await db_session.execute(
+                select(Survey.start_at, Survey.finishes_at).where(
+                    Survey.id == grade_data.survey_id
+                )
+            )
+        ).first()
+        if survey_window is None:
+            raise GradeRejectedError("survey_not_found")
+        if not survey_window.start_at <= now <= survey_window.finishes_at:
+            raise GradeRejectedError("survey_closed")
+        raise GradeRejectedError("duplicate")
 
-    db_session.add(new_grade)
+    await add_to_tallies(
+        db_session,
+        [(new_grade.survey_id, new_grade.grade, new_grade.created_at)],
+    )
 
     if commit_and_refresh:
+        # RETURNING loaded every column, keep them instead of a refresh
+        db_session.expunge(new_grade)
         await db_session.commit()
-        await db_session.refresh(new_grade)
 
     return new_grade
 
 
+async def add_grades(
+    db_session: AsyncSession,
+    grades_data: Sequence[GradeBulkItemSchema],
+    user_id: int,
+    now: datetime | None = None,
+) -> list[dict[str, Any]]:
+    """Validates the grades with set-based queries and inserts the valid
+    ones with a single executemany. Returns a result for every item."""
+    if now is None:
+        now = datetime.now()
+
+    survey_ids = {grade.survey_id for grade in grades_data}
+    user_ids = {grade.user_id or user_id for grade in grades_data}
+
+    survey_windows = {
+        survey_id: (start_at, finishes_at)
+        for survey_id, start_at, finishes_at in (
+            await db_session.execute(
+                select(Survey.id, Survey.start_at, Survey.finishes_at).where(
+                    Survey.id.in_(survey_ids)
+                )
+            )
+        ).tuples()
+    }
+    existing_user_ids = set(
+        (
+            await db_session.scalars(
+                select(User.id).where(User.id.in_(user_ids))
+            )
+        ).all()
+    )
+    already_graded = set(
+        (
+            await db_session.execute(
+                select(Grade.survey_id, Grade.user_id).where(
+                    tuple_(Grade.survey_id, Grade.user_id).in_(
+                        [
+                            (grade.survey_id, grade.user_id or user_id)
+                            for grade in grades_data
+                        ]
+                    )
+                )
+            )
+        )
+        .tuples()
+        .all()
+    )
+
+    results: list[dict[str, Any]] = []
+    new_grades: list[dict[str, Any]] = []
+    for index, grade in enumerate(grades_data):
+        grade_user_id = grade.user_id or user_id
+        window = survey_windows.get(grade.survey_id)
+        if window is None:
+            status = "survey_not_found"
+        elif not window[0] <= now <= window[1]:
+            status = "survey_closed"
+        elif grade_user_id not in existing_user_ids:
+            status = "user_not_found"
+        elif (grade.survey_id, grade_user_id) in already_graded:
+            status = "duplicate"
+        else:
+            status = "created"
+            # Later items for the same survey and user are duplicates
+            already_graded.add((grade.survey_id, grade_user_id))
+            new_grades.append(
+                {
+                    "grade": grade.grade,
+                    "survey_id": grade.survey_id,
+                    "user_id": grade_user_id,
+                }
+            )
+        results.append({"index": index, "status": status})
+
+    if new_grades:
+        rows = (
+            await db_session.execute(
+                insert_grades_skipping_duplicates(
+                    db_session.bind.dialect.name
+                ),
+                new_grades,
+            )
+        ).all()
+        await add_to_tallies(
+            db_session,
+            ((row.survey_id, row.grade, row.created_at) for row in rows),
+        )
+        await db_session.commit()
+
+        stored = {(row.survey_id, row.user_id): row.id for row in rows}
+        created = (
+            result for result in results if result["status"] == "created"
+        )
+        for result, grade in zip(created, new_grades):
+            grade_id = stored.get((grade["survey_id"], grade["user_id"]))
+            if grade_id is None:
+                # Stored by a concurrent request since the check above
+                result["status"] = "duplicate"
+            else:
+                result["id"] = grade_id
+
+    return results
+
+
 async def get_grade_for_survey(
     db_session: AsyncSession, user_id: int, survey_id: int
 ) -> Grade:
@@ -45,6 +250,122 @@ async def get_grades_by_survey(
 ) -> Sequence[Grade]:
     return (
         await db_session.scalars(
-            select(Grade).where(Grade.survey_id == survey_id)
+            select(Grade)
+            .where(Grade.survey_id == survey_id)
+            .order_by(Grade.created_at)
         )
     ).all()
+
+
+def stream_grades_by_survey(
+    db_session: AsyncSession,
+    survey_id: int,
+    last_grade_id: int | None = None,
+    chunk_size: int = 1000,
+) -> AsyncIterator[Grade]:
+    query = select(Grade).where(Grade.survey_id == survey_id)
+    if last_grade_id is not None:
+        query = query.where(Grade.id <= last_grade_id)
+    return stream_entities(
+        db_session, query.order_by(Grade.created_at), chunk_size
+    )
+
+
+async def get_latest_grade_id(
+    db_session: AsyncSession, survey_id: int
+) -> int | None:
+    return (
+        await db_session.execute(
+            select(func.max(Grade.id)).where(Grade.survey_id == survey_id)
+        )
+    ).scalar_one()
+
+
+def seconds_since(
+    column: ColumnElement[datetime], moment: datetime, dialect_name: str
+) -> ColumnElement[float]:
+    if dialect_name == "sqlite":
+        return (func.julianday(column) - func.julianday(moment)) * 86400
+    return func.extract("epoch", column - moment)
+
+
+async def get_survey_stats(
+    db_session: AsyncSession,
+    survey: Survey,
+    buckets: int,
+    last_grade_id: int | None = None,
+) -> dict[str, Any]:
+    """Vote statistics of a survey computed by the DB in a single query.
+
+    Votes are grouped by (grade, time bucket), which is at most
+    grades x buckets rows; every statistic is derived from those groups.
+    """
+    time_bins = get_time_bins(survey.start_at, survey.finishes_at, buckets)
+    bucket_seconds = (
+        survey.finishes_at - survey.start_at
+    ).total_seconds() / buckets
+
+    if bucket_seconds > 0:
+        dialect_name = db_session.bind.dialect.name
+        offset_seconds = seconds_since(
+            Grade.created_at, survey.start_at, dialect_name
+        )
+        bucket_index = offset_seconds / bucket_seconds
+        if dialect_name == "postgresql":
+            # CAST rounds to the nearest integer on PostgreSQL. SQLite
+            # truncates, which floors the non-negative offsets, and has no
+            # floor() in builds without the math functions
+            bucket_index = func.floor(bucket_index)
+        bucket = case(
+            (
+                (Grade.created_at >= survey.start_at)
+                & (Grade.created_at < survey.finishes_at),
+                cast(bucket_index, Integer),
+            ),
+            else_=None,
+        )
+    else:
+        # A survey without duration has no time buckets to fill
+        bucket = null()
+
+    query = select(Grade.grade, bucket, func.count()).where(
+        Grade.survey_id == survey.id
+    )
+    if last_grade_id is not None:
+        query = query.where(Grade.id <= last_grade_id)
+    groups = (
+        await db_session.execute(query.group_by(Grade.grade, bucket))
+    ).all()
+
+    grade_counts: dict[int, int] = {}
+    bucket_counts = [0] * buckets
+    for grade, bucket_index, count in groups:
+        grade_counts[grade] = grade_counts.get(grade, 0) + count
+        if bucket_index is not None:
+            # Guard against floating point rounding at the last edge
+            bucket_counts[min(max(bucket_index, 0), buckets - 1)] += count
+
+    total = sum(grade_counts.values())
+    return {
+        "survey_id": survey.id,
+        "count": total,
+        "mean": (
+            sum(grade * count for grade, count in grade_counts.items()) / total
+            if total
+            else None
+        ),
+        "min": min(grade_counts) if grade_counts else None,
+        "max": max(grade_counts) if grade_counts else None,
+        "grade_counts": [
+            {"grade": grade, "count": count}
+            for grade, count in sorted(grade_counts.items())
+        ],
+        "time_buckets": [
+            {
+                "start_at": time_bins[i],
+                "finishes_at": time_bins[i + 1],
+                "count": bucket_counts[i],
+            }
+            for i in range(buckets)
+        ],
+    }
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, TypedDict
+
+from config import app_config, session_manager
+from metrics import create_background_task
+from schemas.grades import SurveyResultsSchema
+from services.tallies import (
+    format_survey_results,
+    get_bucket_start,
+    get_tallies,
+)
+
+logger = logging.getLogger(__name__)
+
+# SSE comment, keeps proxies from closing idle streams and lets the server
+# notice clients that went away
+HEARTBEAT_MESSAGE = b": heartbeat\n\n"
+
+# (survey_id, grade, created_at) of a stored vote, None when not known
+LiveVote = tuple[int, int, datetime | None]
+
+
+class LiveResultsStats(TypedDict):
+    surveys: int
+    subscribers: int
+    recorded_votes: int
+    published_messages: int
+    resyncs: int
+
+
+class SurveyResultsPublisher:
+    """Results of one survey, pushed to all of its subscribers.
+
+    The counts are loaded from the tallies and then updated in memory with
+    the votes stored by this worker. Votes stored by other workers show up
+    with the resync from the tallies every ``resync_seconds``. A message is
+    built at most once per ``interval`` and shared by all subscribers, a
+    slow subscriber skips to the latest one.
+    """
+
+    def __init__(self, survey_id: int, interval: float, resync_seconds: int):
+        self.survey_id = survey_id
+        self.subscribers = 0
+        self.message: bytes | None = None
+        self.published_messages = 0
+        self.resyncs = 0
+        self._interval = interval
+        self._resync_seconds = resync_seconds
+        self._grade_counts: Counter[int] = Counter()
+        self._bucket_counts: Counter[datetime] = Counter()
+        self._changed = False
+        self._recorded_votes = 0
+        self._published = asyncio.Event()
+        self._closed = False
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = create_background_task(self._run())
+
+    def close(self):
+        self._closed = True
+        if self._task is not None:
+            self._task.cancel()
+        self._published.set()
+
+    def record_vote(self, grade: int, created_at: datetime):
+        self._grade_counts[grade] += 1
+        self._bucket_counts[get_bucket_start(created_at)] += 1
+        self._recorded_votes += 1
+        self._changed = True
+
+    async def _resync(self) -> bool:
+        recorded_votes = self._recorded_votes
+        async with session_manager.session() as db_session:
+            grade_counts, bucket_counts = await get_tallies(
+                db_session, self.survey_id
+            )
+        if self._recorded_votes != recorded_votes:
+            # A vote recorded meanwhile may be missing from the tallies
+            # read, keep the counts and retry at the next interval
+            return False
+
+        self._grade_counts = Counter(
+            {grade: count for (_, grade), count in grade_counts.items()}
+        )
+        self._bucket_counts = Counter(
+            {start: count for (_, start), count in bucket_counts.items()}
+        )
+        self._changed = True
+        self.resyncs += 1
+        return True
+
+    def _publish(self):
+        self._changed = False
+        results = format_survey_results(
+            self.survey_id,
+            sorted(self._grade_counts.items()),
+            sorted(self._bucket_counts.items()),
+        )
+        data = SurveyResultsSchema.model_validate(results).model_dump_json(
+            by_alias=True
+        )
+        message = f"event: results\ndata: {data}\n\n".encode()
+        if message == self.message:
+            return
+
+        self.message = message
+        self.published_messages += 1
+        published, self._published = self._published, asyncio.Event()
+        published.set()
+
+    async def _run(self):
+        resynced_at = None
+        while True:
+            if (
+                resynced_at is None
+                or time.monotonic() - resynced_at >= self._resync_seconds
+            ):
+                try:
+                    if await self._resync():
+                        resynced_at = time.monotonic()
+                except Exception:
+                    logger.exception(
+                        "Failed to load the tallies of survey %d",
+                        self.survey_id,
+                    )
+            if self._changed:
+                self._publish()
+            await asyncio.sleep(self._interval)
+
+    async def messages(self, heartbeat_seconds: float) -> AsyncIterator[bytes]:
+        sent: bytes | None = None
+        while not self._closed:
+            if self.message is not None and self.message is not sent:
+                sent = self.message
+                yield sent
+            try:
+                await asyncio.wait_for(
+                    self._published.wait(), heartbeat_seconds
+                )
+            except asyncio.TimeoutError:
+                yield HEARTBEAT_MESSAGE
+
+
+class LiveResultsHub:
+    """One ``SurveyResultsPublisher`` per survey with subscribers, fed by
+    the votes of this worker. A publisher is started by the first
+    subscriber of its survey and stopped when the last one leaves."""
+
+    def __init__(
+        self,
+        interval_ms: int = 1000,
+        resync_seconds: int = 30,
+        heartbeat_seconds: int = 15,
+    ):
+        self._interval = interval_ms / 1000
+        self._resync_seconds = resync_seconds
+        self._heartbeat_seconds = heartbeat_seconds
+        self._publishers: dict[int, SurveyResultsPublisher] = {}
+        self._recorded_votes = 0
+
+    async def subscribe(self, survey_id: int) -> AsyncIterator[bytes]:
+        """Server-sent events with the results of the survey, until the
+        client disconnects"""
+        publisher = self._publishers.get(survey_id)
+        if publisher is None:
+            publisher = SurveyResultsPublisher(
+                survey_id, self._interval, self._resync_seconds
+            )
+            self._publishers[survey_id] = publisher
+            publisher.start()
+
+        publisher.subscribers += 1
+        try:
+            async for message in publisher.messages(self._heartbeat_seconds):
+                yield message
+        finally:
+            publisher.subscribers -= 1
+            if (
+                not publisher.subscribers
+                and self._publishers.get(survey_id) is publisher
+            ):
+                publisher.close()
+                del self._publishers[survey_id]
+
+    def record_votes(self, votes: Iterable[LiveVote]):
+        """Counts stored votes in the results of the watched surveys"""
+        if not self._publishers:
+            return
+        for survey_id, grade, created_at in votes:
+            publisher = self._publishers.get(survey_id)
+            if publisher is None:
+                continue
+            if created_at is None:
+                # Grades are stamped by the DB with the UTC CURRENT_TIMESTAMP
+                created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+            publisher.record_vote(grade, created_at)
+            self._recorded_votes += 1
+
+    def stats(self) -> LiveResultsStats:
+        return {
+            "surveys": len(self._publishers),
+            "subscribers": sum(
+                publisher.subscribers
+                for publisher in self._publishers.values()
+            ),
+            "recorded_votes": self._recorded_votes,
+            "published_messages": sum(
+                publisher.published_messages
+                for publisher in self._publishers.values()
+            ),
+            "resyncs": sum(
+                publisher.resyncs for publisher in self._publishers.values()
+            ),
+        }
+
+    def shutdown(self):
+        """Stops the publishers and ends the streams of their subscribers"""
+        for publisher in self._publishers.values():
+            publisher.close()
+        self._publishers.clear()
+
+
+live_results = LiveResultsHub(
+    app_config.LIVE_RESULTS_INTERVAL_MS,
+    app_config.LIVE_RESULTS_RESYNC_SECONDS,
+    app_config.LIVE_RESULTS_HEARTBEAT_SECONDS,
+)
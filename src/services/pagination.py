@@ -1,16 +1,32 @@
 import math
-from typing import Any, Tuple, TypeVar
+from typing import Any, AsyncIterator, Tuple, TypeVar
 
-from sqlalchemy import Select, func, select
+from sqlalchemy import ColumnElement, Select, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from schemas.pagination import CursorPaginationParamsSchema
+
 T = TypeVar("T", bound=Tuple)
 
 
 def paginate_query(query: Select[T], page: int, limit: int) -> Select[T]:
-    return query.limit(limit).offset(
-        page - 1 if page == 1 else (page - 1) * limit
-    )
+    return query.limit(limit).offset((page - 1) * limit)
+
+
+def paginate_query_by_cursor(
+    query: Select[T],
+    cursor_column: ColumnElement[int],
+    after: int | None,
+    limit: int,
+) -> Select[T]:
+    """Keyset pagination: rows strictly after the cursor in cursor order.
+
+    One row more than the limit is fetched so the caller can tell whether
+    there is a next page without a separate COUNT query.
+    """
+    if after is not None:
+        query = query.where(cursor_column > after)
+    return query.order_by(cursor_column).limit(limit + 1)
 
 
 async def count_total_entities(
@@ -29,3 +45,45 @@ def get_total_pages(limit: int, total_count: int) -> int:
 
 def get_has_next_page(page: int, total_pages: int) -> bool:
     return total_pages > page
+
+
+async def get_cursor_page(
+    db_session: AsyncSession,
+    query: Select[Any],
+    cursor_column: ColumnElement[int],
+    pagination: CursorPaginationParamsSchema,
+) -> dict[str, Any]:
+    docs = (
+        await db_session.scalars(
+            paginate_query_by_cursor(
+                query, cursor_column, pagination.after, pagination.limit
+            )
+        )
+    ).all()
+
+    has_next_page = len(docs) > pagination.limit
+    docs = docs[: pagination.limit]
+
+    return {
+        "docs": docs,
+        "next_cursor": (
+            getattr(docs[-1], cursor_column.key) if has_next_page else None
+        ),
+        "has_next_page": has_next_page,
+        "total_docs": (
+            await count_total_entities(db_session, query)
+            if pagination.with_total
+            else None
+        ),
+    }
+
+
+async def stream_entities(
+    db_session: AsyncSession, query: Select[Any], chunk_size: int = 1000
+) -> AsyncIterator[Any]:
+    """Yield ORM entities while fetching them from the DB in chunks."""
+    result = await db_session.stream_scalars(
+        query.execution_options(yield_per=chunk_size)
+    )
+    async for entity in result:
+        yield entity
@@ -0,0 +1,122 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import Callable, TypedDict, TypeVar
+
+from config import app_config, hash_helper
+
+T = TypeVar("T")
+
+
+class PasswordHasherStats(TypedDict):
+    executor: str
+    workers: int
+    max_concurrency: int
+    in_flight: int
+    queued: int
+    completed: int
+
+
+# Module level functions, so that they can be pickled for a process pool
+def hash_password(password: str) -> str:
+    return hash_helper.hash(password)
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    return hash_helper.verify(password, password_hash)
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing and verification off the event loop.
+
+    Every bcrypt call takes tens to hundreds of milliseconds of CPU time, so
+    calls are submitted to a thread or process pool. A semaphore bounds how
+    many calls are submitted at once; callers above the limit wait in the
+    queue, which is reported by ``stats``.
+    """
+
+    def __init__(
+        self,
+        executor_kind: str = "thread",
+        workers: int = 4,
+        max_concurrency: int = 8,
+    ):
+        self._executor_kind = executor_kind
+        self._workers = workers
+        self._max_concurrency = max_concurrency
+        self._executor: Executor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._in_flight = 0
+        self._queued = 0
+        self._completed = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self._executor_kind == "process":
+                # Don't fork the event loop and pooled DB connections
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._workers,
+                    thread_name_prefix="password-hasher",
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._semaphore
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        semaphore = self._get_semaphore()
+        self._queued += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._queued -= 1
+
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), func, *args
+            )
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(verify_password, password, password_hash)
+
+    def stats(self) -> PasswordHasherStats:
+        return {
+            "executor": self._executor_kind,
+            "workers": self._workers,
+            "max_concurrency": self._max_concurrency,
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "completed": self._completed,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._semaphore = None
+
+
+password_hasher = PasswordHasher(
+    app_config.PASSWORD_HASHING_EXECUTOR,
+    app_config.PASSWORD_HASHING_WORKERS,
+    app_config.PASSWORD_HASHING_MAX_CONCURRENCY,
+)
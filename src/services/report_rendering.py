@@ -0,0 +1,161 @@
+import io
+from datetime import datetime
+from typing import Sequence
+
+import matplotlib.dates as mdates
+import matplotlib.pyplot as plt
+from matplotlib.dates import date2num
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import services.grades as GradeService
+import services.surveys as SurveyService
+from config import (
+    DatabaseSessionManager,
+    app_config,
+    get_engine_kwargs,
+    get_sqlite_pragmas,
+)
+from models.surveys import Survey
+
+
+class PagedLineWriter:
+    """Draws lines of text top to bottom, starting a new page when full."""
+
+    def __init__(
+        self,
+        c: canvas.Canvas,
+        y_position: float,
+        top: float = 750,
+        bottom: float = 50,
+        line_height: float = 20,
+    ):
+        self._canvas = c
+        self._y_position = y_position
+        self._top = top
+        self._bottom = bottom
+        self._line_height = line_height
+
+    def skip(self, lines: int = 1):
+        self._y_position -= lines * self._line_height
+
+    def draw(self, x_position: float, text: str):
+        if self._y_position < self._bottom:
+            self._canvas.showPage()
+            self._y_position = self._top
+        self._canvas.drawString(x_position, self._y_position, text)
+        self.skip()
+
+
+def render_histogram_png(
+    time_bins: Sequence[datetime], counts: Sequence[int]
+) -> io.BytesIO:
+    histogram_buffer = io.BytesIO()
+    interval_duration = time_bins[1] - time_bins[0]
+    time_bins_numeric = date2num(time_bins)
+
+    plt.figure(figsize=(10, 6))
+    plt.bar(time_bins[:-1], counts, width=interval_duration, align="edge", color="skyblue")  # type: ignore
+    plt.xlabel("Time")
+    plt.ylabel("Number of grades")
+    plt.title("Distribution of grades over time")
+
+    # Format x-axis as dates
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
+    plt.gca().xaxis.set_major_locator(mdates.HourLocator(interval=1))
+    plt.xticks(rotation=45)
+
+    # Display each bin's start time on the x-axis
+    bin_labels = [bin_start.strftime("%H:%M") for bin_start in time_bins]
+    plt.xticks(
+        time_bins_numeric, bin_labels, rotation=45, ha="right", fontsize=8
+    )  # type: ignore
+
+    # Render the histogram image into memory
+    plt.savefig(histogram_buffer, format="png")
+    plt.close()
+    histogram_buffer.seek(0)
+    return histogram_buffer
+
+
+async def write_report_pdf(
+    db_session: AsyncSession,
+    survey: Survey,
+    last_grade_id: int | None,
+    histogram_bins: int = app_config.REPORT_HISTOGRAM_BINS,
+) -> bytes:
+    """Render the report of a survey as it was at ``last_grade_id``.
+
+    Summary numbers come from a single aggregate query and the detailed
+    list streams grades from the DB in chunks, so no more than one chunk of
+    ORM rows is held in memory regardless of the number of votes.
+    """
+    stats = await GradeService.get_survey_stats(
+        db_session, survey, histogram_bins, last_grade_id
+    )
+
+    # 1. Create a histogram
+    time_bins = [bucket["start_at"] for bucket in stats["time_buckets"]]
+    time_bins.append(survey.finishes_at)
+    histogram = render_histogram_png(
+        time_bins, [bucket["count"] for bucket in stats["time_buckets"]]
+    )
+
+    # 2. Generate PDF report
+    pdf_buffer = io.BytesIO()
+    c = canvas.Canvas(pdf_buffer, pagesize=letter, pageCompression=1)
+
+    # Title
+    c.drawString(100, 750, f"Report: results for the '{survey.title}' survey")
+    average_grade = stats["mean"] if stats["mean"] is not None else "-"
+    c.drawString(100, 730, f"Average grade {average_grade}")
+
+    # Include histogram
+    c.drawImage(
+        ImageReader(histogram), 100, 420, width=400, height=300
+    )  # Adjust position and size as needed
+
+    # 3. Add summary of voting results (count of each grade)
+    writer = PagedLineWriter(c, 400)
+    writer.draw(100, "Summary of grades:")
+    for grade_count in stats["grade_counts"]:
+        writer.draw(
+            120,
+            f"Grade {grade_count['grade']}: {grade_count['count']} votes",
+        )
+
+    # 4. List each vote with its timestamp, a new page is started when full
+    writer.skip()
+    writer.draw(100, "Detailed list of grade:")
+    async for entry in GradeService.stream_grades_by_survey(
+        db_session, survey.id, last_grade_id
+    ):
+        writer.draw(
+            120, f"User gave a grade of {entry.grade} on {entry.created_at}"
+        )
+
+    # Finalize and save the PDF
+    c.showPage()
+    c.save()
+
+    return pdf_buffer.getvalue()
+
+
+async def generate_report(survey_id: int, last_grade_id: int | None) -> bytes:
+    # The report runs in a worker process with its own event loop, so it
+    # can't share the engine (and its pooled connections) of the app
+    session_manager = DatabaseSessionManager(
+        app_config.DATABASE_URL,
+        get_engine_kwargs(app_config),
+        get_sqlite_pragmas(app_config),
+    )
+    try:
+        async with session_manager.session() as db_session:
+            survey = await SurveyService.get_survey(db_session, survey_id)
+            if survey is None:
+                raise LookupError(f"Survey {survey_id} does not exist")
+            return await write_report_pdf(db_session, survey, last_grade_id)
+    finally:
+        await session_manager.close()
@@ -0,0 +1,196 @@
+import asyncio
+import importlib
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Literal
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import services.grades as GradeService
+from config import app_config
+from metrics import create_background_task
+
+ReportJobStatus = Literal["pending", "done", "failed"]
+ReportCacheKey = tuple[int, int | None]
+
+
+# Imports matplotlib and reportlab, only the report worker processes load
+# it, the app process never renders a report itself
+REPORT_RENDERING_MODULE = "services.report_rendering"
+
+
+def load_report_renderer():
+    importlib.import_module(REPORT_RENDERING_MODULE)
+
+
+def build_report_pdf(survey_id: int, last_grade_id: int | None) -> bytes:
+    """Entry point of a report job, executed inside a worker process."""
+    report_rendering = importlib.import_module(REPORT_RENDERING_MODULE)
+    return asyncio.run(
+        report_rendering.generate_report(survey_id, last_grade_id)
+    )
+
+
+def format_job_id(survey_id: int, last_grade_id: int | None) -> str:
+    return f"{survey_id}-{last_grade_id or 0}"
+
+
+def parse_job_id(job_id: str) -> ReportCacheKey | None:
+    survey_id, _, last_grade_id = job_id.partition("-")
+    if not (survey_id.isdecimal() and last_grade_id.isdecimal()):
+        return None
+    return int(survey_id), int(last_grade_id) or None
+
+
+class ReportJob:
+    def __init__(self, survey_id: int, last_grade_id: int | None):
+        # Names the report, so that any server worker can resolve the job
+        self.id = format_job_id(survey_id, last_grade_id)
+        self.survey_id = survey_id
+        self.last_grade_id = last_grade_id
+        self.status: ReportJobStatus = "pending"
+        self.error: str | None = None
+        self.pdf: bytes | None = None
+        self._finished = asyncio.Event()
+
+    @property
+    def cache_key(self) -> ReportCacheKey:
+        return (self.survey_id, self.last_grade_id)
+
+    def finish(self, pdf: bytes):
+        self.pdf = pdf
+        self.status = "done"
+        self._finished.set()
+
+    def fail(self, error: str):
+        self.error = error
+        self.status = "failed"
+        self._finished.set()
+
+    async def wait(self):
+        await self._finished.wait()
+
+
+class ReportJobManager:
+    """Renders survey reports in a process pool and caches finished PDFs.
+
+    A report only changes when a new grade is added, so finished PDFs are
+    cached under the survey id and the id of its latest grade. Requests for
+    a report that is already being rendered share the pending job.
+
+    Jobs live in the memory of the server worker that started them. Their
+    ids are made of that cache key, so a worker asked about a job it does
+    not know serves the report from its own cache or starts rendering it.
+    """
+
+    def __init__(self, workers: int = 1, cache_size: int = 32, jobs_limit=256):
+        self._workers = workers
+        self._cache_size = cache_size
+        self._jobs_limit = jobs_limit
+        self._executor: Executor | None = None
+        self._jobs: OrderedDict[str, ReportJob] = OrderedDict()
+        self._pending: dict[ReportCacheKey, ReportJob] = {}
+        self._cache: OrderedDict[ReportCacheKey, bytes] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # Forking a process that runs an event loop and worker threads
+            # is unsafe, spawned workers import what they need themselves
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _remember(self, job: ReportJob):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self._jobs_limit:
+            self._jobs.popitem(last=False)
+
+    def _store(self, cache_key: ReportCacheKey, pdf: bytes):
+        self._cache[cache_key] = pdf
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def get_job(self, survey_id: int, job_id: str) -> ReportJob | None:
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job if job.survey_id == survey_id else None
+
+        # Submitted to another worker or already forgotten by this one
+        cache_key = parse_job_id(job_id)
+        if cache_key is None or cache_key[0] != survey_id:
+            return None
+        return self._start(*cache_key)
+
+    async def submit(
+        self, db_session: AsyncSession, survey_id: int
+    ) -> ReportJob:
+        last_grade_id = await GradeService.get_latest_grade_id(
+            db_session, survey_id
+        )
+        return self._start(survey_id, last_grade_id)
+
+    def _start(self, survey_id: int, last_grade_id: int | None) -> ReportJob:
+        cache_key = (survey_id, last_grade_id)
+
+        pending_job = self._pending.get(cache_key)
+        if pending_job is not None:
+            return pending_job
+
+        job = ReportJob(survey_id, last_grade_id)
+        self._remember(job)
+
+        cached_pdf = self._cache.get(cache_key)
+        if cached_pdf is not None:
+            self._cache.move_to_end(cache_key)
+            job.finish(cached_pdf)
+            return job
+
+        self._pending[cache_key] = job
+        task = create_background_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: ReportJob):
+        try:
+            pdf = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(),
+                build_report_pdf,
+                job.survey_id,
+                job.last_grade_id,
+            )
+        except Exception as error:
+            job.fail(repr(error))
+        else:
+            self._store(job.cache_key, pdf)
+            job.finish(pdf)
+        finally:
+            self._pending.pop(job.cache_key, None)
+
+    async def preload(self):
+        """Starts the worker processes and loads the renderer in them, so
+        that the first report does not wait for it"""
+        executor = self._get_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(executor, load_report_renderer)
+                for _ in range(self._workers)
+            )
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+report_jobs = ReportJobManager(
+    app_config.REPORT_WORKERS,
+    app_config.REPORT_CACHE_SIZE,
+    app_config.REPORT_JOBS_LIMIT,
+)
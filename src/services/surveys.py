@@ -1,11 +1,212 @@
-from typing import List, Sequence
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Sequence, TypedDict
 from uuid import UUID
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from config import AppConfig, app_config
+from models.grades import Grade
 from models.surveys import Survey
-from schemas.surveys import SurveySchema
+from schemas.pagination import CursorPaginationParamsSchema
+from schemas.surveys import SurveyPlusSchema, SurveySchema
+from services.pagination import get_cursor_page, stream_entities
+
+
+class SurveyCacheBackend(ABC):
+    """Storage of the survey cache, values are dicts and lists of dicts"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Any | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any): ...
+
+    @abstractmethod
+    async def delete(self, *keys: str): ...
+
+    def size(self) -> int | None:
+        return None
+
+
+class MemorySurveyCacheBackend(SurveyCacheBackend):
+    """LRU cache of the worker, entries expire after ``ttl`` seconds"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any):
+        if self._max_size <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self._ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def size(self) -> int | None:
+        return len(self._entries)
+
+
+class LocalKeyValueStore:
+    """In-process stand-in for a shared store such as Redis, implementing
+    the part of the ``redis.asyncio`` client the survey cache uses"""
+
+    def __init__(self):
+        self._values: dict[str, tuple[float | None, bytes]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: str | bytes, ex: int | None = None):
+        if isinstance(value, str):
+            value = value.encode()
+        expires_at = None if ex is None else time.monotonic() + ex
+        self._values[key] = (expires_at, value)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._values.pop(key, None)
+
+
+class KeyValueSurveyCacheBackend(SurveyCacheBackend):
+    """Cache shared by the workers, values are stored as JSON"""
+
+    def __init__(self, store, ttl: int, prefix: str = "io-lab:"):
+        self._store = store
+        self._ttl = ttl
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Any | None:
+        value = await self._store.get(self._prefix + key)
+        return None if value is None else json.loads(value)
+
+    async def set(self, key: str, value: Any):
+        await self._store.set(
+            self._prefix + key,
+            json.dumps(value, default=datetime.isoformat),
+            ex=self._ttl,
+        )
+
+    async def delete(self, *keys: str):
+        await self._store.delete(*(self._prefix + key for key in keys))
+
+
+def create_survey_cache_backend(
+    config: AppConfig,
+) -> SurveyCacheBackend | None:
+    if config.SURVEY_CACHE_BACKEND == "memory":
+        return MemorySurveyCacheBackend(
+            config.SURVEY_CACHE_SIZE, config.SURVEY_CACHE_TTL_SECONDS
+        )
+    if config.SURVEY_CACHE_BACKEND == "shared":
+        if config.SURVEY_CACHE_URL is None:
+            store = LocalKeyValueStore()
+        else:
+            # Optional dependency, only needed with a shared cache
+            import redis.asyncio
+
+            store = redis.asyncio.from_url(config.SURVEY_CACHE_URL)
+        return KeyValueSurveyCacheBackend(
+            store, config.SURVEY_CACHE_TTL_SECONDS
+        )
+    return None
+
+
+class SurveyCacheStats(TypedDict):
+    backend: str | None
+    size: int | None
+    hits: int
+    misses: int
+    hit_ratio: float | None
+
+
+class SurveyCache:
+    """Read-through cache of surveys in front of a pluggable backend.
+
+    Surveys are cached as plain data and handed out as transient ``Survey``
+    instances, so they never get attached to the caller's session.
+    """
+
+    def __init__(self, backend: SurveyCacheBackend | None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Any | None:
+        if self.backend is None:
+            return None
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any):
+        if self.backend is not None:
+            await self.backend.set(key, value)
+
+    async def invalidate(self, *keys: str):
+        if self.backend is not None:
+            await self.backend.delete(*keys)
+
+    def stats(self) -> SurveyCacheStats:
+        lookups = self.hits + self.misses
+        return {
+            "backend": (
+                None if self.backend is None else type(self.backend).__name__
+            ),
+            "size": None if self.backend is None else self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+        }
+
+
+survey_cache = SurveyCache(create_survey_cache_backend(app_config))
+
+ALL_SURVEYS_CACHE_KEY = "surveys:all"
+
+
+def survey_cache_key(id: int) -> str:
+    return f"survey:{id}"
+
+
+def survey_to_data(survey: Survey) -> dict[str, Any]:
+    return SurveyPlusSchema.model_validate(survey).model_dump()
+
+
+def survey_from_data(data: dict[str, Any]) -> Survey:
+    # Validated again, values read from a shared backend are JSON
+    return Survey(**SurveyPlusSchema.model_validate(data).model_dump())
 
 
 async def create_survey(
@@ -26,15 +227,66 @@ async def create_survey(
         await db_session.commit()
         await db_session.refresh(new_survey)
 
+    # Any survey update or delete has to invalidate the cache the same way
+    await survey_cache.invalidate(ALL_SURVEYS_CACHE_KEY)
+
     return new_survey
 
 
 async def get_survey(db_session: AsyncSession, id: int) -> Survey | None:
-    return (
+    cached_survey = await survey_cache.get(survey_cache_key(id))
+    if cached_survey is not None:
+        return survey_from_data(cached_survey)
+
+    survey = (
         await db_session.scalars(select(Survey).where(Survey.id == id))
     ).first()
+    if survey is not None:
+        await survey_cache.set(survey_cache_key(id), survey_to_data(survey))
+    return survey
 
 
 async def get_all_survey(db_session) -> List[Survey]:
+    cached_surveys = await survey_cache.get(ALL_SURVEYS_CACHE_KEY)
+    if cached_surveys is not None:
+        return [survey_from_data(data) for data in cached_surveys]
+
     all_surveys = (await db_session.scalars(select(Survey))).all()
+    await survey_cache.set(
+        ALL_SURVEYS_CACHE_KEY,
+        [survey_to_data(survey) for survey in all_surveys],
+    )
     return all_surveys
+
+
+async def get_surveys_page(
+    db_session: AsyncSession, pagination: CursorPaginationParamsSchema
+) -> dict[str, Any]:
+    return await get_cursor_page(
+        db_session, select(Survey), Survey.id, pagination
+    )
+
+
+def stream_surveys(db_session: AsyncSession) -> AsyncIterator[Survey]:
+    return stream_entities(db_session, select(Survey).order_by(Survey.id))
+
+
+async def get_current_surveys_for_user(
+    db_session: AsyncSession, user_id: int, now: datetime | None = None
+) -> Sequence[Survey]:
+    """Open surveys the user has not graded yet, fetched in a single query."""
+    if now is None:
+        now = datetime.now()
+
+    already_graded = select(Grade.id).where(
+        (Grade.survey_id == Survey.id) & (Grade.user_id == user_id)
+    )
+    return (
+        await db_session.scalars(
+            select(Survey).where(
+                (Survey.start_at <= now)
+                & (Survey.finishes_at >= now)
+                & ~already_graded.exists()
+            )
+        )
+    ).all()
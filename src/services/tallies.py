@@ -0,0 +1,244 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Iterable, Sequence
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import app_config
+from models.grades import Grade
+from models.tallies import SurveyTally, SurveyTallyBucket
+
+EPOCH = datetime(1970, 1, 1)
+
+# (survey_id, grade, created_at) of a stored vote
+TalliedGrade = tuple[int, int, datetime]
+
+
+def get_dialect_insert(dialect_name: str):
+    """``insert`` of the dialect, which supports ON CONFLICT clauses"""
+    return postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+
+
+def get_bucket_start(
+    created_at: datetime,
+    bucket_seconds: int = app_config.SURVEY_TALLY_BUCKET_SECONDS,
+) -> datetime:
+    bucket_width = timedelta(seconds=bucket_seconds)
+    return EPOCH + (created_at - EPOCH) // bucket_width * bucket_width
+
+
+def count_grades(
+    grades: Iterable[TalliedGrade],
+) -> tuple[Counter[tuple[int, int]], Counter[tuple[int, datetime]]]:
+    """Votes per (survey_id, grade) and per (survey_id, bucket_start)"""
+    grade_counts: Counter[tuple[int, int]] = Counter()
+    bucket_counts: Counter[tuple[int, datetime]] = Counter()
+    for survey_id, grade, created_at in grades:
+        grade_counts[survey_id, grade] += 1
+        bucket_counts[survey_id, get_bucket_start(created_at)] += 1
+    return grade_counts, bucket_counts
+
+
+async def upsert_tallies(
+    db_session: AsyncSession,
+    grade_counts: Counter[tuple[int, int]],
+    bucket_counts: Counter[tuple[int, datetime]],
+):
+    if not grade_counts:
+        return
+
+    dialect_insert = get_dialect_insert(db_session.bind.dialect.name)
+    # Rows are always updated in key order, so that concurrent
+    # transactions cannot deadlock on them
+    tallies = dialect_insert(SurveyTally)
+    await db_session.execute(
+        tallies.on_conflict_do_update(
+            index_elements=[SurveyTally.survey_id, SurveyTally.grade],
+            set_={"count": SurveyTally.count + tallies.excluded.count},
+        ),
+        [
+            {"survey_id": survey_id, "grade": grade, "count": count}
+            for (survey_id, grade), count in sorted(grade_counts.items())
+        ],
+    )
+    buckets = dialect_insert(SurveyTallyBucket)
+    await db_session.execute(
+        buckets.on_conflict_do_update(
+            index_elements=[
+                SurveyTallyBucket.survey_id,
+                SurveyTallyBucket.bucket_start,
+            ],
+            set_={"count": SurveyTallyBucket.count + buckets.excluded.count},
+        ),
+        [
+            {
+                "survey_id": survey_id,
+                "bucket_start": bucket_start,
+                "count": count,
+            }
+            for (survey_id, bucket_start), count in sorted(
+                bucket_counts.items()
+            )
+        ],
+    )
+
+
+async def add_to_tallies(
+    db_session: AsyncSession, grades: Iterable[TalliedGrade]
+):
+    """Adds stored votes to the tallies. Must run in the transaction that
+    stored them, so that votes and tallies are committed together."""
+    await upsert_tallies(db_session, *count_grades(grades))
+
+
+async def count_stored_grades(
+    db_session: AsyncSession, survey_id: int | None = None
+) -> tuple[Counter[tuple[int, int]], Counter[tuple[int, datetime]]]:
+    query = select(Grade.survey_id, Grade.grade, Grade.created_at)
+    if survey_id is not None:
+        query = query.where(Grade.survey_id == survey_id)
+    grades = await db_session.stream(query.execution_options(yield_per=1000))
+    grade_counts: Counter[tuple[int, int]] = Counter()
+    bucket_counts: Counter[tuple[int, datetime]] = Counter()
+    async for partition in grades.partitions():
+        partition_grade_counts, partition_bucket_counts = count_grades(
+            partition
+        )
+        grade_counts.update(partition_grade_counts)
+        bucket_counts.update(partition_bucket_counts)
+    return grade_counts, bucket_counts
+
+
+async def get_tallies(
+    db_session: AsyncSession, survey_id: int | None = None
+) -> tuple[Counter[tuple[int, int]], Counter[tuple[int, datetime]]]:
+    tallies = select(
+        SurveyTally.survey_id, SurveyTally.grade, SurveyTally.count
+    )
+    buckets = select(
+        SurveyTallyBucket.survey_id,
+        SurveyTallyBucket.bucket_start,
+        SurveyTallyBucket.count,
+    )
+    if survey_id is not None:
+        tallies = tallies.where(SurveyTally.survey_id == survey_id)
+        buckets = buckets.where(SurveyTallyBucket.survey_id == survey_id)
+    grade_counts: Counter[tuple[int, int]] = Counter(
+        {
+            (survey_id, grade): count
+            for survey_id, grade, count in await db_session.execute(tallies)
+            if count
+        }
+    )
+    bucket_counts: Counter[tuple[int, datetime]] = Counter(
+        {
+            (survey_id, bucket_start): count
+            for survey_id, bucket_start, count in await db_session.execute(
+                buckets
+            )
+            if count
+        }
+    )
+    return grade_counts, bucket_counts
+
+
+async def rebuild_tallies(
+    db_session: AsyncSession, survey_id: int | None = None
+) -> int:
+    """Recomputes the tallies of a survey, or of all of them, from the
+    grades table. Returns the number of votes counted."""
+    delete_tallies = delete(SurveyTally)
+    delete_buckets = delete(SurveyTallyBucket)
+    if survey_id is not None:
+        delete_tallies = delete_tallies.where(
+            SurveyTally.survey_id == survey_id
+        )
+        delete_buckets = delete_buckets.where(
+            SurveyTallyBucket.survey_id == survey_id
+        )
+    # Deleting first takes the write lock before the grades are read, so
+    # that no vote is stored in between on SQLite
+    await db_session.execute(delete_tallies)
+    await db_session.execute(delete_buckets)
+
+    grade_counts, bucket_counts = await count_stored_grades(
+        db_session, survey_id
+    )
+    await upsert_tallies(db_session, grade_counts, bucket_counts)
+    await db_session.commit()
+    return sum(grade_counts.values())
+
+
+async def check_tallies(
+    db_session: AsyncSession, survey_id: int | None = None
+) -> list[int]:
+    """Compares the tallies with the grades table, returns the ids of the
+    surveys whose tallies differ"""
+    expected = await count_stored_grades(db_session, survey_id)
+    tallied = await get_tallies(db_session, survey_id)
+
+    mismatched: set[int] = set()
+    for expected_counts, tallied_counts in zip(expected, tallied):
+        for key in expected_counts.keys() | tallied_counts.keys():
+            if expected_counts[key] != tallied_counts[key]:
+                mismatched.add(key[0])
+    return sorted(mismatched)
+
+
+async def get_survey_results(
+    db_session: AsyncSession, survey_id: int
+) -> dict[str, Any]:
+    """Vote count, sum, mean, per-grade and per-time-bucket counts read
+    from the tallies, without scanning the votes"""
+    grade_counts = (
+        await db_session.execute(
+            select(SurveyTally.grade, SurveyTally.count)
+            .where(
+                (SurveyTally.survey_id == survey_id) & (SurveyTally.count > 0)
+            )
+            .order_by(SurveyTally.grade)
+        )
+    ).all()
+    bucket_counts = (
+        await db_session.execute(
+            select(SurveyTallyBucket.bucket_start, SurveyTallyBucket.count)
+            .where(
+                (SurveyTallyBucket.survey_id == survey_id)
+                & (SurveyTallyBucket.count > 0)
+            )
+            .order_by(SurveyTallyBucket.bucket_start)
+        )
+    ).all()
+
+    return format_survey_results(survey_id, grade_counts, bucket_counts)
+
+
+def format_survey_results(
+    survey_id: int,
+    grade_counts: Sequence[tuple[int, int]],
+    bucket_counts: Sequence[tuple[datetime, int]],
+) -> dict[str, Any]:
+    """Results of a survey from its (grade, count) and (bucket_start,
+    count) pairs, in order"""
+    total = sum(count for _, count in grade_counts)
+    grades_sum = sum(grade * count for grade, count in grade_counts)
+    bucket_width = timedelta(seconds=app_config.SURVEY_TALLY_BUCKET_SECONDS)
+    return {
+        "survey_id": survey_id,
+        "count": total,
+        "sum": grades_sum,
+        "mean": grades_sum / total if total else None,
+        "grade_counts": [
+            {"grade": grade, "count": count} for grade, count in grade_counts
+        ],
+        "time_buckets": [
+            {
+                "start_at": bucket_start,
+                "finishes_at": bucket_start + bucket_width,
+                "count": count,
+            }
+            for bucket_start, count in bucket_counts
+        ],
+    }
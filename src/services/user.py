@@ -1,12 +1,14 @@
-from typing import Sequence
+from typing import Any, AsyncIterator, Sequence
 from uuid import UUID
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from config import hash_helper
 from models.user import User
+from schemas.pagination import CursorPaginationParamsSchema
 from schemas.user import UserSignUpSchema
+from services.pagination import get_cursor_page, stream_entities
+from services.passwords import password_hasher
 
 
 async def get_user(db_session: AsyncSession, id: int) -> User | None:
@@ -19,6 +21,16 @@ async def get_users(db_session: AsyncSession) -> Sequence[User] | None:
     return (await db_session.scalars(select(User))).all()
 
 
+async def get_users_page(
+    db_session: AsyncSession, pagination: CursorPaginationParamsSchema
+) -> dict[str, Any]:
+    return await get_cursor_page(db_session, select(User), User.id, pagination)
+
+
+def stream_users(db_session: AsyncSession) -> AsyncIterator[User]:
+    return stream_entities(db_session, select(User).order_by(User.id))
+
+
 async def get_user_by_username(
     db_session: AsyncSession, username: str
 ) -> User | None:
@@ -32,7 +44,7 @@ async def create_user(
     user_data: UserSignUpSchema,
     commit_and_refresh: bool = True,
 ) -> User:
-    password_hash: str = hash_helper.encrypt(user_data.password)
+    password_hash: str = await password_hasher.hash(user_data.password)
 
     new_user = User()
     new_user.username = user_data.username
@@ -0,0 +1,46 @@
+"""Maintenance of the survey_tallies tables.
+
+    python src/tallies.py rebuild [--survey-id ID]
+    python src/tallies.py check [--survey-id ID]
+
+``check`` exits with status 1 when the tallies of a survey differ from
+its grades, ``rebuild`` recomputes them from the grades table.
+"""
+
+import argparse
+import asyncio
+import sys
+
+import services.tallies as TallyService
+from config import session_manager
+
+
+async def run(command: str, survey_id: int | None) -> int:
+    async with session_manager.session() as db_session:
+        if command == "rebuild":
+            votes = await TallyService.rebuild_tallies(db_session, survey_id)
+            print(f"Rebuilt the tallies from {votes} votes")
+            exit_code = 0
+        else:
+            mismatched = await TallyService.check_tallies(
+                db_session, survey_id
+            )
+            if mismatched:
+                print(f"Tallies differ from grades of surveys: {mismatched}")
+            else:
+                print("Tallies match the grades")
+            exit_code = 1 if mismatched else 0
+    await session_manager.close()
+    return exit_code
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--survey-id", type=int)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.command, args.survey_id)))
+
+
+if __name__ == "__main__":
+    main()
@@ -33,3 +33,27 @@ def migrationsRevert(c):
     # Ensure we're using the virtual environment's alembic
     venv_alembic = path.join("venv", "bin", "alembic")
     c.run(f"{venv_alembic} downgrade -1", pty=True)
+
+
+@task
+def talliesRebuild(c):
+    """Recompute the survey tallies from the grades table."""
+    c.run("python src/tallies.py rebuild", pty=True)
+
+
+@task
+def talliesCheck(c):
+    """Check that the survey tallies match the grades table."""
+    c.run("python src/tallies.py check", pty=True)
+
+
+@task
+def startProduction(c):
+    """Start the production server, a worker per CPU by default."""
+    c.run("python src/main.py", env={"ENVIRONMENT": "production"})
+
+
+@task
+def test(c):
+    """Run the test suite."""
+    c.run("python -m pytest", pty=True)
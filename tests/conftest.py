@@ -0,0 +1,23 @@
+"""The tests reuse the benchmark checks on smaller workloads.
+
+``common`` points the app at a throwaway SQLite database, so it is imported
+here before any test module imports something from ``src``.
+"""
+
+import common  # noqa: F401
+import pytest
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session", autouse=True)
+async def session_manager(anyio_backend):
+    """Runs all tests on a single event loop, which the app's connection
+    pool and background tasks are bound to, and closes the DB at the end"""
+    from config import session_manager
+
+    yield session_manager
+    await session_manager.close()
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+from common import SRC_DIR
+
+# Only report worker processes import the rendering libraries
+RENDERING_PACKAGES = {"matplotlib", "numpy", "reportlab"}
+
+
+def test_app_does_not_import_the_report_renderer():
+    loaded = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, app; print(' '.join(sys.modules))",
+        ],
+        cwd=SRC_DIR,
+        env=os.environ,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+
+    packages = {module.partition(".")[0] for module in loaded}
+    assert not packages & RENDERING_PACKAGES
@@ -0,0 +1,19 @@
+import pytest
+from duplicate_votes import run_duplicates
+
+from config import app_config
+
+pytestmark = pytest.mark.anyio
+
+VOTES = 1000
+
+
+@pytest.mark.parametrize("buffered", [False, True], ids=["direct", "buffered"])
+async def test_parallel_duplicates_store_a_single_grade(monkeypatch, buffered):
+    # Restored afterwards, run_duplicates switches the grade buffer
+    monkeypatch.setattr(app_config, "GRADE_BUFFER_ENABLED", buffered)
+
+    result = await run_duplicates(VOTES, buffered)
+
+    assert result["statuses"] == {201: 1, 409: VOTES - 1}
+    assert result["stored_grades"] == 1
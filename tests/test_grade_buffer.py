@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from common import seed_voting
+
+import config
+from app import app
+from config import app_config
+from models.surveys import Survey
+from services.grade_buffer import grade_buffer
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_votes_before_and_after_the_survey_opens(monkeypatch):
+    monkeypatch.setattr(app_config, "GRADE_BUFFER_ENABLED", True)
+    _, (token,) = await seed_voting(voters=1, surveys=0)
+    start_at = datetime.now() + timedelta(seconds=1)
+    async with config.session_manager.session() as db_session:
+        db_session.add(
+            Survey(
+                title="Survey",
+                body="Body",
+                start_at=start_at,
+                finishes_at=start_at + timedelta(hours=1),
+            )
+        )
+        await db_session.commit()
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test"
+    ) as client:
+
+        async def vote() -> int:
+            response = await client.post(
+                "/grades/",
+                json={"grade": 5, "surveyId": 1},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            return response.status_code
+
+        early = await vote()
+        await asyncio.sleep((start_at - datetime.now()).total_seconds())
+        on_time = await vote()
+        again = await vote()
+    await grade_buffer.shutdown()
+
+    assert (early, on_time, again) == (400, 201, 409)
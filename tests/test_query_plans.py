@@ -0,0 +1,11 @@
+import pytest
+from query_plans import EXPECTED_INDEXES, explain_queries, uses_index
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_lookups_search_their_index():
+    plans = await explain_queries()
+
+    for name, index in EXPECTED_INDEXES.items():
+        assert uses_index(plans[name], index), plans[name]
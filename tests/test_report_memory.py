@@ -0,0 +1,17 @@
+import pytest
+from report_memory import render_report, seed
+
+pytestmark = pytest.mark.anyio
+
+VOTES = 200_000
+RSS_BUDGET_MB = 512
+
+
+async def test_report_rendering_stays_within_rss_budget(monkeypatch):
+    # Restored afterwards, render_report turns SQLite mmap off for good
+    monkeypatch.setenv("SQLITE_MMAP_SIZE", "0")
+    survey_id, last_grade_id = await seed(VOTES)
+
+    result = render_report(survey_id, last_grade_id)
+
+    assert result["peak_rss_mb"] <= RSS_BUDGET_MB, result
@@ -0,0 +1,25 @@
+import argparse
+
+import pytest
+from tally_consistency import run_consistency
+
+from config import app_config
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_tallies_match_grades_after_concurrent_votes(monkeypatch):
+    # Restored afterwards, the buffered votes switch the grade buffer on
+    monkeypatch.setattr(app_config, "GRADE_BUFFER_ENABLED", False)
+    args = argparse.Namespace(voters=100, surveys=4, concurrency=50, reads=1)
+
+    result = await run_consistency(args)
+
+    assert set(result["statuses"]) == {
+        "direct_201",
+        "bulk_200",
+        "buffered_201",
+    }
+    assert result["mismatched_surveys"] == []
+    assert result["mismatched_surveys_after_rebuild"] == []
+    assert result["rebuilt_votes"] == args.voters * args.surveys